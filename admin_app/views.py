@@ -17,6 +17,8 @@ from course.serializers import (
     StudentCourseProgressSerializer
 )
 from base.custom_permissions import IsAdmin, IsTutor
+from base.custom_cache import invalidate_tags
+from course.utils import invalidate_course_lists
 from contest.models import Leaderboard
 from contest.serializers import LeaderboardSerializer
 from user_profile.serializers import CourseSalesSerializer
@@ -67,6 +69,13 @@ class RequestedCourses(ModelViewSet):
     serializer_class = CourseSerializer
     permission_classes = [IsAdmin]
 
+    def perform_update(self, serializer):
+        """
+        Save the reviewed course and invalidate the cached course lists.
+        """
+        course = serializer.save()
+        invalidate_course_lists(course.category)
+
 
 # ViewSet for managing categories with 'Requested' status
 class RequestedCategory(ModelViewSet):
@@ -85,6 +94,13 @@ class RequestedCategory(ModelViewSet):
         if hasattr(self.request.user, 'tutor_profile'):
             serializer.save(status='Requested')
 
+    def perform_update(self, serializer):
+        """
+        Save the reviewed category and invalidate the cached category lists.
+        """
+        serializer.save()
+        invalidate_tags('categories')
+
 
 # ViewSet for admin dashboard data
 class AdminDashboardView(ViewSet):
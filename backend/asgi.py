@@ -1,7 +1,6 @@
 import os
 import django
 from django.core.asgi import get_asgi_application
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.apps import apps
 from django.core.asgi import get_asgi_application
@@ -15,11 +14,12 @@ django.setup()
 
 
 from community.routing import websocket_urlpatterns
+from base.jwt_middleware import JWTAuthMiddleware
 
 application = ProtocolTypeRouter(
     {
         "http": get_asgi_application(),
-        "websocket": AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+        "websocket": JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
     }
 )
 print(application)
\ No newline at end of file
@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 import environ
 
 
@@ -31,6 +32,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     'django_celery_beat',
     'celery',
@@ -252,6 +254,33 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'flush-counters': {
+        'task': 'course.tasks.flush_counters_task',
+        'schedule': 30.0,
+    },
+    'ingest-progress-events': {
+        'task': 'course.tasks.ingest_progress_events_task',
+        'schedule': 10.0,
+    },
+    'compact-notifications': {
+        'task': 'community.tasks.compact_notifications_task',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'reap-stale-presence': {
+        'task': 'community.tasks.reap_stale_presence_task',
+        'schedule': 60.0,
+    },
+    'contest-status': {
+        'task': 'contest.tasks.update_contest_status_task',
+        'schedule': 60.0 * 10,
+    },
+}
+
+# Notification retention: read notifications older than this are collapsed into digests,
+# and every notification older than the archive age is moved to the archive table
+NOTIFICATION_DIGEST_AFTER_DAYS = 30
+NOTIFICATION_ARCHIVE_AFTER_DAYS = 180
 
 SITE_URL = 'https://learnora1.vercel.app/'
 STRIPE_SECRET_KEY=env('STRIPE_SECRET')
@@ -259,10 +288,22 @@ STRIPE_SECRET_KEY=env('STRIPE_SECRET')
 
 ASGI_APPLICATION = 'backend.asgi.application'
 
+# Group and channel names are consistently hashed over every listed Redis host, so the
+# groups of large communities spread across shards. Every process must list the same hosts
+# in the same order. CHANNEL_LAYER_BACKEND can be set to
+# channels_redis.pubsub.RedisPubSubChannelLayer to fan out with one PUBLISH per group.
+CHANNEL_REDIS_HOSTS = env.list('CHANNEL_REDIS_HOSTS', default=['redis://redis:6379/0'])
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {"hosts": [("redis", 6379)]},
+        "BACKEND": env('CHANNEL_LAYER_BACKEND', default='channels_redis.core.RedisChannelLayer'),
+        "CONFIG": {
+            "hosts": CHANNEL_REDIS_HOSTS,
+            # Messages a channel buffers before new ones are dropped, and seconds they are kept
+            "capacity": env.int('CHANNEL_LAYER_CAPACITY', default=1000),
+            "expiry": env.int('CHANNEL_LAYER_EXPIRY', default=30),
+            "group_expiry": env.int('CHANNEL_LAYER_GROUP_EXPIRY', default=86400),
+        },
     }
 }
 
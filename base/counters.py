@@ -0,0 +1,116 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+
+# Buffered increments live in one Redis hash per counter, keyed by primary key
+BUFFER_KEY_PREFIX = 'counter'
+# Seconds a flush may hold the lock of a counter
+FLUSH_LOCK_TIMEOUT = 300
+
+
+def increment(model, pk, field, amount=1):
+    """
+    Add amount to a counter column with a single UPDATE ... SET field = field + amount.
+
+    The row is never read into Python, so concurrent increments are not lost
+    and no other column is rewritten. Counters never drop below zero.
+    """
+    return model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + amount, 0)})
+
+
+def _buffer_key(model, field):
+    """Returns the Redis hash that buffers the increments of a counter column."""
+    return f'{BUFFER_KEY_PREFIX}:{model._meta.label_lower}:{field}'
+
+
+def buffer_increment(model, pk, field, amount=1):
+    """
+    Record an increment in Redis with a single HINCRBY, without touching the database.
+
+    Use it for hot counters such as view counts; the buffered increments are
+    written to the database in batches by flush_counters.
+    """
+    get_redis_connection('default').hincrby(_buffer_key(model, field), pk, amount)
+
+
+def flush_counter(redis, key, batch_size=500):
+    """
+    Apply the buffered increments of one counter hash to the database.
+
+    The hash is first renamed to a processing key, so increments recorded
+    while flushing go to a fresh hash and are picked up by the next flush.
+    A processing key left behind by a failed flush is applied first.
+
+    A lock keeps concurrent flushes of the same counter apart, and the
+    processing key is renamed away inside the transaction that applies it,
+    so a batch is applied at most once.
+    """
+    lock = redis.lock(f'{key}:lock', timeout=FLUSH_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        # Another worker is flushing this counter
+        return 0
+    try:
+        return _apply_buffered(redis, key, batch_size)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # The lock expired during a very long flush
+            pass
+
+
+def _apply_buffered(redis, key, batch_size):
+    """Apply the processing hash of a counter to the database; the caller holds its lock."""
+    _, label, field = key.rsplit(':', 2)
+    model = apps.get_model(label)
+    processing_key = f'{key}:flushing'
+    applied_key = f'{key}:applied'
+
+    # Left only by a worker that died while committing; the batch may be applied already
+    redis.delete(applied_key)
+
+    if not redis.exists(processing_key):
+        if not redis.exists(key):
+            # Nothing was buffered since the last flush
+            return 0
+        redis.rename(key, processing_key)
+
+    deltas = {int(pk): int(amount) for pk, amount in redis.hgetall(processing_key).items() if int(amount)}
+    pks = list(deltas)
+
+    try:
+        with transaction.atomic():
+            for start in range(0, len(pks), batch_size):
+                batch = pks[start:start + batch_size]
+                delta = Case(*[When(pk=pk, then=Value(deltas[pk])) for pk in batch], default=Value(0))
+                model.objects.filter(pk__in=batch).update(**{field: Greatest(F(field) + delta, 0)})
+            # Confirms the apply as the last step of the transaction; if it fails, the updates roll back
+            redis.rename(processing_key, applied_key)
+    except Exception:
+        # The updates rolled back, keep the batch for the next flush
+        if redis.exists(applied_key):
+            redis.rename(applied_key, processing_key)
+        raise
+
+    redis.delete(applied_key)
+    return len(pks)
+
+
+def flush_counters():
+    """
+    Write every buffered counter to the database.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    redis = get_redis_connection('default')
+    # Buffer keys are prefix:label:field; their processing, applied and lock keys share them
+    keys = {
+        ':'.join(key.decode().split(':')[:3])
+        for key in redis.scan_iter(match=f'{BUFFER_KEY_PREFIX}:*')
+    }
+    return sum(flush_counter(redis, key) for key in keys)
@@ -0,0 +1,171 @@
+import time
+import hashlib
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+# Tag versions never expire on their own; entries built from them do.
+TAG_KEY_PREFIX = 'cache_tag'
+
+
+def _tag_key(tag):
+    """Returns the cache key that stores the current version of a tag."""
+    return f'{TAG_KEY_PREFIX}:{tag}'
+
+
+def _new_version():
+    """
+    Returns a fresh tag version.
+
+    Time based, so a tag whose version was evicted never falls back to a
+    version that older entries were written under.
+    """
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(tags):
+    """
+    Fetch the current version of each tag in a single round trip,
+    initialising any tag that has no version yet.
+    """
+    tag_keys = {tag: _tag_key(tag) for tag in tags}
+    stored = cache.get_many(list(tag_keys.values()))
+
+    versions = {}
+    for tag, tag_key in tag_keys.items():
+        version = stored.get(tag_key)
+        if version is None:
+            cache.add(tag_key, _new_version(), timeout=None)
+            version = cache.get(tag_key)
+        versions[tag] = version
+    return versions
+
+
+def make_tagged_key(key, tags):
+    """
+    Build the versioned cache key for an entry that depends on the given tags.
+    Invalidating any of the tags changes the key, so stale entries are never read.
+    """
+    versions = get_tag_versions(tags)
+    suffix = ':'.join(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    return f'{key}:{suffix}'
+
+
+def get_tagged(key, tags, default=None):
+    """Read an entry cached with set_tagged under the same key and tags."""
+    return cache.get(make_tagged_key(key, tags), default)
+
+
+def set_tagged(key, value, tags, timeout=60 * 15):
+    """Cache a value that is invalidated when any of its tags is invalidated."""
+    cache.set(make_tagged_key(key, tags), value, timeout)
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every entry cached under any of the given tags by bumping the
+    tag versions. Other cached data is left untouched.
+    """
+    for tag in tags:
+        tag_key = _tag_key(tag)
+        try:
+            cache.incr(tag_key)
+        except ValueError:
+            cache.set(tag_key, _new_version(), timeout=None)
+
+
+class CachedListMixin:
+    """
+    Caches the rendered JSON of a viewset's list responses.
+
+    Entries are keyed by a cache scope (user, role or public), the query
+    parameters (category, search, page, ...) and the view's cache tags, and
+    hold the final response bytes, so a hit costs no SQL and no serialization.
+
+    Once an entry is older than cache_timeout it is stale: one request
+    revalidates it while the others keep serving the stale body until
+    cache_stale_timeout runs out. On a miss only one request builds the
+    page; concurrent requests wait for it while its lock lives, and only
+    build the page themselves once the lock is gone without an entry.
+    """
+    cache_prefix = None
+    cache_timeout = 60 * 15
+    cache_stale_timeout = 60 * 5
+    cache_lock_timeout = 10
+    cache_poll_interval = 0.05
+
+    def get_cache_scope(self):
+        """Returns the part of the key that separates users who see different data."""
+        user = self.request.user
+        return user.id if user.is_authenticated else 'public'
+
+    def get_cache_tags(self):
+        """Returns the tags whose invalidation must drop the cached responses."""
+        return []
+
+    def get_list_cache_key(self):
+        """Builds the versioned cache key for the current list request."""
+        params = urlencode(sorted(self.request.query_params.items()))
+        params_hash = hashlib.md5(params.encode()).hexdigest()
+        key = f'response:{self.cache_prefix or self.basename}:{self.get_cache_scope()}:{params_hash}'
+        return make_tagged_key(key, self.get_cache_tags())
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve the list from the response cache, building it on a miss.
+        """
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        key = self.get_list_cache_key()
+        lock_key = f'{key}:lock'
+
+        entry = cache.get(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            return self.cached_response(entry)
+
+        holds_lock = cache.add(lock_key, 1, self.cache_lock_timeout)
+        if not holds_lock:
+            # Serve stale while another request revalidates, or wait for it on a miss
+            entry = entry or self.wait_for_entry(key, lock_key)
+            if entry is not None:
+                return self.cached_response(entry)
+
+        try:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            entry = {
+                'body': request.accepted_renderer.render(response.data, request.accepted_media_type, self.get_renderer_context()),
+                'content_type': request.accepted_media_type,
+                'fresh_until': time.time() + self.cache_timeout,
+            }
+            cache.set(key, entry, self.cache_timeout + self.cache_stale_timeout)
+        finally:
+            if holds_lock:
+                cache.delete(lock_key)
+
+        return self.cached_response(entry)
+
+    def wait_for_entry(self, key, lock_key):
+        """
+        Waits for the request holding the lock to cache the response, for as
+        long as the lock lives. Returns None when the lock is released or
+        expires without an entry, and the caller builds the page itself.
+        """
+        deadline = time.monotonic() + self.cache_lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.cache_poll_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+            if cache.get(lock_key) is None:
+                # The holder gave up, e.g. on an error response; it may have cached just before releasing
+                return cache.get(key)
+        return None
+
+    def cached_response(self, entry):
+        """Returns the cached bytes without going through serialization."""
+        return HttpResponse(entry['body'], content_type=entry['content_type'])
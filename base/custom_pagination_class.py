@@ -1,4 +1,8 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor
 
 class CustomPagination(PageNumberPagination):
     page_size = 9
@@ -7,4 +11,175 @@ class CustomPagination(PageNumberPagination):
 
 class CustomMessagePagination(PageNumberPagination):
     page_size = 50
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+def _encode_position_value(value):
+    """Serializes the values of a cursor position JSON has no type for, keeping full precision."""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a composite key, by default (created_at, id),
+    newest first.
+
+    The cursor encodes the value of every ordering field of the last row
+    served, and the next page continues strictly after that row, so deep
+    pages cost the same as the first one, ties on the leading fields are
+    neither skipped nor repeated, and no COUNT(*) or OFFSET is run.
+
+    The ordering must end in a unique non-null column (usually the primary
+    key) and should be backed by an index on the same columns. Nullable
+    fields are supported; NULLs sort as Postgres sorts them, after every
+    value in ascending order.
+    """
+    page_size = 9
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """Lets the view choose the ordering through get_cursor_ordering."""
+        if hasattr(view, 'get_cursor_ordering'):
+            return tuple(view.get_cursor_ordering())
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Returns the page of rows following (or, for a reverse cursor, preceding) the cursor position."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.cursor.position if self.cursor else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(order[1:] if order.startswith('-') else f'-{order}' for order in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            if len(position) != len(ordering):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(queryset.model, ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to know whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_keyset_filter(self, model, ordering, position):
+        """
+        Build the condition matching the rows strictly after position in the
+        given ordering: (a after x) OR (a = x AND b after y) OR ...
+
+        Args:
+            model: The model of the paginated queryset.
+            ordering (tuple): The ordering the rows are read in.
+            position (list): The ordering values of the last row served.
+
+        Returns:
+            Q: The keyset condition.
+        """
+        condition = Q(pk__in=[])
+        same = Q()
+        for order, value in zip(ordering, position):
+            field = order.lstrip('-')
+            try:
+                nullable = model._meta.get_field(field).null
+            except FieldDoesNotExist:
+                nullable = True
+
+            # NULLs sort after every value ascending, before every value descending
+            if order.startswith('-'):
+                after = Q(**{f'{field}__isnull': False}) if value is None else Q(**{f'{field}__lt': value})
+            elif value is None:
+                after = Q(pk__in=[])
+            else:
+                after = Q(**{f'{field}__gt': value})
+                if nullable:
+                    after |= Q(**{f'{field}__isnull': True})
+
+            condition |= same & after
+            same &= Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+        return condition
+
+    def get_next_link(self):
+        """Returns the link to the rows after the last row of the page."""
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        """Returns the link to the rows before the first row of the page."""
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        """Decodes the cursor of the request, whose position is a JSON list of ordering values."""
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        """Encodes a cursor, storing its position as a JSON list of ordering values."""
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(list(cursor.position), default=_encode_position_value))
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Returns the values of every ordering field of a row."""
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            return [instance[field] for field in fields]
+        return [getattr(instance, field) for field in fields]
+
+
+class CustomMessageCursorPagination(CustomCursorPagination):
+    """
+    Cursor pagination for chat history. The first page holds the latest
+    messages and the next link loads older ones.
+    """
+    page_size = 50
+
+
+class CustomNotificationCursorPagination(CustomCursorPagination):
+    page_size = 20
+
+
+class CustomLeaderboardCursorPagination(CustomCursorPagination):
+    """
+    Cursor pagination over the rollups of one leaderboard period, highest
+    score first, with the user id breaking ties.
+    """
+    page_size = 10
+    ordering = ('-score', 'user_id')
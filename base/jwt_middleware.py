@@ -0,0 +1,81 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class WebSocketTokenUser(TokenUser):
+    """
+    Stateless user built from the signed claims of an access token.
+    Custom claims such as role are available as attributes.
+    """
+
+    @cached_property
+    def username(self):
+        # Student tokens carry the username in the 'user' claim
+        return self.token.get('username') or self.token.get('user', '')
+
+
+def get_scope_token(scope):
+    """
+    Returns the raw access token of a WebSocket handshake, from the 'token'
+    query parameter (browsers cannot set headers on WebSockets) or from a
+    Bearer authorization header.
+    """
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+
+    headers = dict(scope.get('headers', []))
+    authorization = headers.get(b'authorization', b'').decode().split()
+    if len(authorization) == 2 and authorization[0] in api_settings.AUTH_HEADER_TYPES:
+        return authorization[1]
+    return None
+
+
+@database_sync_to_async
+def get_token_user(token):
+    """
+    Returns the user of a validated token whose claims lack the username,
+    looked up once for the lifetime of the connection.
+    """
+    from users.models import CustomUser
+    return CustomUser.objects.filter(id=token[api_settings.USER_ID_CLAIM], is_active=True).first() or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with a simplejwt access token.
+
+    The token is validated locally (signature, expiry and token type) and
+    the user is built from its claims, without touching the database or
+    the session table. It is resolved once, at the handshake, and kept in
+    the scope for the life of the connection; connections without a valid
+    token get an AnonymousUser, which consumers reject before accepting.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = await self.authenticate(scope)
+        return await super().__call__(scope, receive, send)
+
+    async def authenticate(self, scope):
+        """Returns the user of the handshake's access token, or an AnonymousUser."""
+        raw_token = get_scope_token(scope)
+        if not raw_token:
+            return AnonymousUser()
+
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return AnonymousUser()
+
+        if 'username' not in token and 'user' not in token:
+            # Tokens issued before the username claim was added
+            return await get_token_user(token)
+        return WebSocketTokenUser(token)
@@ -1,19 +1,71 @@
-import json
+import time
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from .models import Community, Message, Notification
-from users.models import CustomUser
+from .models import Community
+from .message_buffer import message_buffer
+from .presence import TYPING_INTERVAL, connect_member, heartbeat_member, disconnect_member
+from .framing import CompactFrameMixin
+from .replay import ensure_sequence, record_message, acknowledge, get_acknowledged, get_missed_messages
 from channels.db import database_sync_to_async
 
 
-class GroupChatConsumer(AsyncWebsocketConsumer):
-    """Handles real-time group chat functionality."""
+def redis_sync_to_async(func):
+    """
+    Wrap a function that talks to Redis for use in a consumer; it may still
+    make the occasional query, e.g. record_message reseeding a lost counter.
+
+    It runs on the default thread pool instead of the single thread shared
+    with database_sync_to_async, so chat traffic is not queued behind the
+    database calls of every other connection of the process.
+    """
+    return sync_to_async(func, thread_sensitive=False)
+
+
+class GroupChatConsumer(CompactFrameMixin, AsyncWebsocketConsumer):
+    """
+    Handles real-time group chat functionality.
+
+    The sender, the community and its member ids are resolved once per
+    connection and kept on the consumer; membership changes arrive as
+    channel layer events. Messages are broadcast right away and stored in
+    bulk by the write-behind message buffer.
+
+    Presence of members is kept in Redis and refreshed by heartbeat frames;
+    the group only receives a delta when a member comes online or goes
+    offline, and typing indicators are rate limited per connection and
+    never stored.
+
+    Chat messages carry a per community seq. A reconnecting client passes
+    ?resume=<seq> or sends a resume frame and receives what it missed, from
+    the Redis ring buffer of recent messages or, for larger gaps, from one
+    indexed range scan. Replayed messages may overlap live ones; clients
+    drop frames with a seq they already have.
+
+    Clients offering the msgpack subprotocol get compact, batched frames
+    (see CompactFrameMixin).
+    """
 
     async def connect(self):
         """Establish connection to the WebSocket and join the chat group."""
-        print("Connecting to group chat")
         self.slug = self.scope['url_route']['kwargs']['slug']
         self.room_group_name = f'chat_{self.slug}'
-        print(f"Connecting to room group: {self.room_group_name}")
+
+        self.community = await self.get_community(self.slug)
+        if self.community is None:
+            await self.close()
+            return
+
+        # Reject connections without a valid access token before accepting
+        self.user = self.scope.get('user')
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.member_ids = await self.get_member_ids(self.community)
+        await database_sync_to_async(ensure_sequence)(self.community.id)
+        self.is_present = False
+        self.last_typing = 0
 
         # Join the room group
         await self.channel_layer.group_add(
@@ -21,35 +73,71 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_frames()
+
+        resume = parse_qs(self.scope.get('query_string', b'').decode()).get('resume')
+        if resume and resume[0].isdigit():
+            await self.replay(int(resume[0]))
+
+        if self.user.id in self.member_ids:
+            self.is_present = True
+            if await redis_sync_to_async(connect_member)(self.community.id, self.user.id):
+                await self.send_presence('online')
 
     async def disconnect(self, code):
         """Handle disconnection from the WebSocket."""
+        self.discard_frames()
+
+        if getattr(self, 'is_present', False):
+            self.is_present = False
+            if await redis_sync_to_async(disconnect_member)(self.community.id, self.user.id):
+                await self.send_presence('offline')
+
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        print(f"Disconnected from room group: {self.room_group_name}")
+
+        # Make sure the messages sent on this connection are stored
+        await message_buffer.flush()
 
     async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming messages from the WebSocket."""
-        print(f"Received data: {text_data}")
-
         # Parse the incoming message
-        text_data_json = json.loads(text_data)
+        text_data_json = self.read_frame(text_data, bytes_data)
         message = text_data_json.get('message')
-        user_id = text_data_json.get('user')
         message_type = text_data_json.get('type')
-        print(message_type)
-        print(text_data_json)
 
-        # Fetch the user based on the user_id
-        user = await self.get_user(user_id)
+        user = self.user
+
+        if message_type == 'heartbeat':
+            await self.heartbeat()
+            return
+
+        if message_type == 'typing':
+            await self.typing()
+            return
+
+        if message_type == 'resume':
+            await self.resume(text_data_json.get('seq'))
+            return
+
+        if message_type == 'ack':
+            seq = text_data_json.get('seq')
+            if isinstance(seq, int) and user.id in self.member_ids:
+                await redis_sync_to_async(acknowledge)(self.community.id, user.id, seq)
+            return
 
         if not user or not message:
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'error': 'Invalid message or user'
-            }))
+            })
+            return
+
+        if user.id not in self.member_ids:
+            await self.send_frame({
+                'error': 'You are not a member of this community'
+            })
             return
 
         # Handle video call messages
@@ -64,88 +152,124 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
                 }
             )
         else:
-            # Handle regular chat messages
-            community = await self.get_community(self.slug)
-            if community and user.is_authenticated:
-                await self.save_message(community, user, message)
-                print('Message saved')
-
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'chat_message',
-                        'message': message,
-                        'user': user.username,
-                        'userID': user.id,
-                    }
-                )
-
-                # Fetch community members and create notifications
-                members = await self.get_community_members(community)
-                notifications = [
-                    Notification(
-                        recipient=member,
-                        community=community,
-                        message=f'New message from {user.username}',
-                        notification_type='new_message',
-                        link=f'/community/{community.slug}'
-                    ) for member in members if member.id != user.id
-                ]
-                await self.create_notifications(notifications)
-
-                # Send notifications to community members
-                for member in members:
-                    if member.id != user.id:
-                        await self.send_member_notification(
-                            message=f'New message from {user.username}',
-                            member=member,
-                            community=community,
-                        )
-            else:
-                await self.send(text_data=json.dumps({
-                    'error': 'User not authenticated or community not found'
-                }))
-
-    async def send_member_notification(self, message, community, member):
-        """Send a notification to a community member."""
-        notification = Notification(
-            recipient=member,
-            community=community,
-            message=message,
-            notification_type='new_message',
-            link=f'/community/{community.slug}'
-        )
-        print('Sending notification...')
+            # Handle regular chat messages, persisted by the write-behind buffer
+            seq = await redis_sync_to_async(record_message)(self.community.id, {
+                'type': 'chat_message',
+                'content': message,
+                'user': user.username,
+                'userID': user.id,
+            })
+            message_buffer.add(self.community, user, message, seq)
 
-        await self.create_notifications([notification])
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    'type': 'chat_message',
+                    'message': message,
+                    'user': user.username,
+                    'userID': user.id,
+                    'seq': seq,
+                }
+            )
 
-        notification_data = {
-            'type': 'new_message',
-            'message': message,
-            'community': community.slug,
-            'link': f'/community/{community.slug}'
-        }
+    async def resume(self, seq):
+        """Replay the messages after seq, or after the last acknowledged one when seq is missing."""
+        if seq is None:
+            seq = await redis_sync_to_async(get_acknowledged)(self.community.id, self.user.id)
+        if isinstance(seq, int):
+            await self.replay(seq)
+
+    async def replay(self, seq):
+        """Send the messages a client missed after seq in a single frame."""
+        messages, complete = await database_sync_to_async(get_missed_messages)(self.community.id, seq)
+        if not complete:
+            # Too far behind; the client reloads the chat history
+            await self.send_frame({'type': 'resync_required'})
+            return
+        await self.send_frame({
+            'type': 'replay',
+            'messages': messages,
+        })
+
+    async def heartbeat(self):
+        """Keep the member online; announce them again if their presence had expired."""
+        if self.is_present and await redis_sync_to_async(heartbeat_member)(self.community.id, self.user.id):
+            await self.send_presence('online')
+
+    async def typing(self):
+        """Broadcast that the member is typing, at most once every TYPING_INTERVAL seconds."""
+        now = time.monotonic()
+        if self.user.id not in self.member_ids or now - self.last_typing < TYPING_INTERVAL:
+            return
+        self.last_typing = now
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'typing_indicator',
+                'user': self.user.username,
+                'userID': self.user.id,
+            }
+        )
 
+    async def send_presence(self, status):
+        """Broadcast that the member came online or went offline."""
         await self.channel_layer.group_send(
-            f'user_{member.id}',
+            self.room_group_name,
             {
-                'type': 'send_notification',
-                'data': notification_data,
+                'type': 'presence',
+                'status': status,
+                'user': self.user.username,
+                'userID': self.user.id,
             }
         )
 
+    async def membership_changed(self, event):
+        """Apply a membership change of the community to the cached member ids."""
+        if event['action'] == 'joined':
+            self.member_ids.update(event['user_ids'])
+        elif event['action'] == 'left':
+            self.member_ids.difference_update(event['user_ids'])
+        else:
+            self.member_ids = await self.get_member_ids(self.community)
+
+        # A member who left no longer counts as online in the community
+        if self.is_present and self.user.id not in self.member_ids:
+            self.is_present = False
+            if await redis_sync_to_async(disconnect_member)(self.community.id, self.user.id):
+                await self.send_presence('offline')
+
     async def chat_message(self, event):
         """Send a chat message to WebSocket clients."""
         message = event['message']
         user = event['user']
         userID = event['userID']
 
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'chat_message',
             'content': message,
             'user': user,
-            'userID': userID
-        }))
+            'userID': userID,
+            'seq': event.get('seq')
+        })
+
+    async def typing_indicator(self, event):
+        """Send a typing indicator of another member to WebSocket clients."""
+        if event['userID'] == self.user.id:
+            return
+        await self.send_frame({
+            'type': 'typing',
+            'user': event['user'],
+            'userID': event['userID']
+        })
+
+    async def presence(self, event):
+        """Send a presence change of a member to WebSocket clients."""
+        await self.send_frame({
+            'type': 'presence',
+            'status': event['status'],
+            'user': event['user'],
+            'userID': event['userID']
+        })
 
     async def video_call(self, event):
         """Send a video call message to WebSocket clients."""
@@ -153,79 +277,55 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
         user = event['user']
         userID = event['userID']
 
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'video_call',
             'message': message,
             'user': user,
             'userID': userID
-        }))
-
-    @database_sync_to_async
-    def save_message(self, community, user, message):
-        """Save a message to the database."""
-        if not community or not user:
-            print('Community not found, cannot save message')
-            return None
-
-        try:
-            print(f'Saving message: {message} for user: {user} in community: {community}')
-            return Message.objects.create(community=community, sender=user, content=message)
-        except Exception as e:
-            print(f'Error saving message: {e}')
-            return None
+        })
 
     @database_sync_to_async
     def get_community(self, slug):
         """Retrieve a community by its slug."""
-        print('Fetching community')
         try:
-            return Community.objects.get(slug=slug)
+            return Community.objects.select_related('tutor').get(slug=slug)
         except Community.DoesNotExist:
             return None
 
     @database_sync_to_async
-    def get_user(self, user_id):
-        """Retrieve a user by their ID."""
-        print('Fetching user')
-        try:
-            return CustomUser.objects.get(id=user_id)
-        except Exception as e:
-            print('User not found:', e)
-            return None
-
-    @database_sync_to_async
-    def get_community_members(self, community):
-        """Retrieve all members of a community."""
-        try:
-            print('Fetching participants')
-            return list(community.participants.all())
-        except Exception as e:
-            print(f'Error fetching participants: {e}')
-            return []
-
-    @database_sync_to_async
-    def create_notifications(self, notifications):
-        """Bulk create notifications in the database."""
-        print('Creating notifications:', notifications)
-        Notification.objects.bulk_create(notifications)
-
-
-class NotificationConsumer(AsyncWebsocketConsumer):
+    def get_member_ids(self, community):
+        """Retrieve the ids of the users allowed to post: the participants and the tutor."""
+        member_ids = set(community.participants.values_list('id', flat=True))
+        if community.tutor:
+            member_ids.add(community.tutor.user_id)
+        return member_ids
+
+class NotificationConsumer(CompactFrameMixin, AsyncWebsocketConsumer):
     """Handles real-time notification functionality for users."""
 
     async def connect(self):
-        """Establish connection to the WebSocket for notifications."""
-        print('Connecting to notification WebSocket...')
-        self.userID = self.scope['url_route']['kwargs']['user_id']
+        """
+        Establish connection to the WebSocket for notifications of the
+        authenticated user; the user id in the URL must be their own.
+        """
+        user = self.scope.get('user')
+        self.group_name = None
+        if not user or not user.is_authenticated or str(user.id) != self.scope['url_route']['kwargs']['user_id']:
+            await self.close()
+            return
+
+        self.userID = user.id
         self.group_name = f"user_{self.userID}"
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept_frames()
 
     async def disconnect(self, code):
         """Handle disconnection from the notification WebSocket."""
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        self.discard_frames()
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def send_notification(self, event):
         """Send notification data to WebSocket clients."""
-        await self.send(text_data=json.dumps(event['data']))
+        await self.send_frame(event['data'])
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def receive_worker(backend, config, group, connections, messages, idle_timeout, ready, results):
+    """Worker process standing in for a daphne node holding a share of the connections."""
+    results.put(asyncio.run(receive_fan_out(backend, config, group, connections, messages, idle_timeout, ready)))
+
+
+async def receive_fan_out(backend, config, group, connections, messages, idle_timeout, ready):
+    """Join connections channels to the group and count the messages each one receives."""
+    layer = import_string(backend)(**config)
+    channel_names = [await layer.new_channel() for _ in range(connections)]
+    for channel_name in channel_names:
+        await layer.group_add(group, channel_name)
+    ready.put(True)
+
+    async def drain(channel_name):
+        received, last_received_at = 0, None
+        while received < messages:
+            try:
+                await asyncio.wait_for(layer.receive(channel_name), idle_timeout)
+            except asyncio.TimeoutError:
+                break
+            received += 1
+            last_received_at = time.time()
+        return received, last_received_at
+
+    stats = await asyncio.gather(*[drain(channel_name) for channel_name in channel_names])
+    received_at = [last_received_at for _, last_received_at in stats if last_received_at]
+    return sum(received for received, _ in stats), max(received_at, default=None)
+
+
+async def send_fan_out(backend, config, group, messages, payload_size):
+    """Send messages to the group, returning when the first one was sent."""
+    layer = import_string(backend)(**config)
+    started_at = time.time()
+    for seq in range(messages):
+        await layer.group_send(group, {'type': 'chat_message', 'seq': seq, 'message': 'x' * payload_size})
+    return started_at
+
+
+class Command(BaseCommand):
+    """
+    Measures the group fan-out throughput of the channel layer as the number
+    of daphne workers grows.
+
+    Each run spreads the same number of WebSocket connections over 1 to N
+    worker processes, joins them all to one group, like a large community,
+    sends messages to it and reports how many deliveries per second reached
+    the connections. Use --stand-in to run against local in-process Redis
+    servers instead of the hosts of CHANNEL_LAYERS.
+    """
+    help = 'Load test channel layer group fan-out with 1 to N worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Largest number of worker processes to run.')
+        parser.add_argument('--connections', type=int, default=1000, help='Connections joined to the group in each run.')
+        parser.add_argument('--messages', type=int, default=20, help='Messages sent to the group in each run.')
+        parser.add_argument('--payload-size', type=int, default=200, help='Size in bytes of each message.')
+        parser.add_argument('--backend', help='Channel layer class to test; defaults to the configured one.')
+        parser.add_argument('--stand-in', action='store_true', help='Run against local fakeredis servers.')
+        parser.add_argument('--shards', type=int, default=2, help='Number of stand-in Redis servers.')
+        parser.add_argument('--idle-timeout', type=float, default=5.0,
+                            help='Seconds a connection waits for its next message before giving up.')
+
+    def handle(self, *args, **options):
+        layer_settings = settings.CHANNEL_LAYERS['default']
+        backend = options['backend'] or layer_settings['BACKEND']
+        config = dict(layer_settings.get('CONFIG', {}))
+        if options['stand_in']:
+            config['hosts'] = self.start_stand_in(options['shards'])
+
+        self.stdout.write(f'{backend} on {len(config["hosts"])} host(s)')
+        self.stdout.write(f'{"workers":>8} {"delivered":>12} {"send ms":>9} {"deliveries/s":>13}')
+        for workers in range(1, options['workers'] + 1):
+            delivered, expected, send_ms, throughput = self.run(backend, config, workers, options)
+            self.stdout.write(f'{workers:>8} {f"{delivered}/{expected}":>12} {send_ms:>9.1f} {throughput:>13.0f}')
+
+    def run(self, backend, config, workers, options):
+        """Fan out to the connections spread over workers processes and measure the deliveries."""
+        context = multiprocessing.get_context('spawn')
+        ready, results = context.Queue(), context.Queue()
+        group = f'loadtest_{uuid.uuid4().hex}'
+        connections = [options['connections'] // workers] * workers
+        connections[0] += options['connections'] % workers
+
+        processes = [
+            context.Process(target=receive_worker, args=(
+                backend, config, group, count, options['messages'], options['idle_timeout'], ready, results,
+            )) for count in connections
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get(timeout=120)
+
+        started_at = asyncio.run(send_fan_out(backend, config, group, options['messages'], options['payload_size']))
+        send_ms = (time.time() - started_at) * 1000
+
+        stats = [results.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join()
+
+        delivered = sum(received for received, _ in stats)
+        finished_at = max((received_at for _, received_at in stats if received_at), default=started_at)
+        throughput = delivered / max(finished_at - started_at, 1e-6)
+        return delivered, options['connections'] * options['messages'], send_ms, throughput
+
+    def start_stand_in(self, shards):
+        """Start local fakeredis servers, one per shard, and return their URLs."""
+        try:
+            from fakeredis import TcpFakeServer
+        except ImportError:
+            raise CommandError('--stand-in requires the fakeredis package (pip install "fakeredis[lua]")')
+
+        hosts = []
+        for _ in range(shards):
+            server = TcpFakeServer(('127.0.0.1', 0))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            hosts.append(f'redis://127.0.0.1:{server.server_address[1]}/0')
+        return hosts
@@ -0,0 +1,117 @@
+import asyncio
+import atexit
+import logging
+from channels.db import database_sync_to_async
+
+from .models import Message
+from .utils import queue_message_notifications
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """
+    Per process write-behind buffer for chat messages.
+
+    Consumers add messages without waiting on the database; a background
+    task inserts them with bulk_create every flush_interval seconds, or as
+    soon as flush_size messages are waiting. Batches are written one at a
+    time in arrival order, so ids and timestamps follow the order messages
+    were received in, and anything still buffered is written when the
+    process exits.
+    """
+    flush_interval = 0.05
+    flush_size = 200
+    max_retries = 3
+
+    def __init__(self):
+        self.pending = []
+        self.flush_lock = None
+        self.wakeup = None
+        self.flusher = None
+        self.failures = 0
+
+    def add(self, community, sender, content, seq=None):
+        """Buffer a message; it is persisted by the next flush."""
+        # The sender may be a stateless token user, so only its id goes on the row
+        message = Message(community=community, sender_id=sender.id, content=content, seq=seq)
+        self.pending.append((message, sender))
+        self.ensure_flusher()
+        if len(self.pending) >= self.flush_size:
+            self.wakeup.set()
+
+    def ensure_flusher(self):
+        """Start the background flush task on the running event loop if it is not running."""
+        loop = asyncio.get_running_loop()
+        if self.flusher is None or self.flusher.done() or self.flusher.get_loop() is not loop:
+            self.flush_lock = asyncio.Lock()
+            self.wakeup = asyncio.Event()
+            self.flusher = loop.create_task(self.run())
+
+    async def run(self):
+        """Flush the buffer periodically, or early when it fills up."""
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every buffered message to the database."""
+        if self.flush_lock is None:
+            return
+        async with self.flush_lock:
+            while self.pending:
+                batch, self.pending = self.pending[:self.flush_size], self.pending[self.flush_size:]
+                try:
+                    await database_sync_to_async(self.write)(batch)
+                    self.failures = 0
+                except Exception:
+                    logger.exception('Failed to write %s buffered chat messages', len(batch))
+                    self.failures += 1
+                    if self.failures < self.max_retries:
+                        # Keep the batch at the front and retry on the next flush
+                        self.pending = batch + self.pending
+                        return
+                    # Write the batch row by row, dropping the messages that cannot be stored
+                    await database_sync_to_async(self.write_each)(batch)
+                    self.failures = 0
+
+    def write(self, batch):
+        """Insert a batch of messages and schedule the notifications of their senders."""
+        Message.objects.bulk_create([message for message, _ in batch])
+        self.notify(batch)
+
+    def write_each(self, batch):
+        """Insert the messages of a failed batch one at a time."""
+        written = []
+        for message, sender in batch:
+            try:
+                message.save()
+                written.append((message, sender))
+            except Exception:
+                logger.exception('Dropping chat message that cannot be stored')
+        self.notify(written)
+
+    def notify(self, batch):
+        """Schedule the member notifications once per community and sender."""
+        senders = {(message.community_id, sender.id): (message.community, sender) for message, sender in batch}
+        for community, sender in senders.values():
+            try:
+                queue_message_notifications(community, sender)
+            except Exception:
+                # The messages are stored; never retry a batch because of its notifications
+                logger.exception('Failed to schedule chat message notifications')
+
+    def flush_sync(self):
+        """Write what is left in the buffer, outside of any event loop."""
+        batch, self.pending = self.pending, []
+        if batch:
+            self.write(batch)
+
+
+message_buffer = MessageWriteBuffer()
+atexit.register(message_buffer.flush_sync)
@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+CREATE_ARCHIVE_TABLE = '''
+CREATE TABLE community_notification_archive (
+    id bigint NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    updated_at timestamp with time zone NULL,
+    recipient_id bigint NOT NULL,
+    community_id bigint NULL,
+    message varchar(100) NULL,
+    notification_type varchar(20) NOT NULL,
+    link varchar(200) NULL,
+    is_read boolean NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE community_notification_archive_default PARTITION OF community_notification_archive DEFAULT;
+CREATE INDEX community_notification_archive_recipient_idx ON community_notification_archive (recipient_id, created_at);
+'''
+
+DROP_ARCHIVE_TABLE = 'DROP TABLE community_notification_archive;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_notification_unread_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_ARCHIVE_TABLE, DROP_ARCHIVE_TABLE),
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('message', models.CharField(max_length=100, null=True)),
+                ('notification_type', models.CharField(max_length=20)),
+                ('link', models.URLField(null=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('community', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='community.community')),
+                ('recipient', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'community_notification_archive',
+                'managed': False,
+            },
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('message', 'Message'), ('new_course', 'New Course'), ('digest', 'Digest')], max_length=20),
+        ),
+    ]
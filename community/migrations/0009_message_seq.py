@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 09:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Number the existing messages of each community in the order they were sent
+BACKFILL_SEQ = """
+UPDATE community_message message
+SET seq = numbered.seq
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY community_id ORDER BY created_at, id) AS seq
+    FROM community_message
+) numbered
+WHERE message.id = numbered.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0008_notification_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SEQ, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['community', 'seq'], name='message_community_seq_idx'),
+        ),
+    ]
@@ -60,6 +60,14 @@ class Message(BaseModel):
         CustomUser, on_delete=models.CASCADE, null=True, related_name='sent_messages'
     )
     content = models.TextField(null=True)
+    # Position of the message in its community, increasing by one per message
+    seq = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['community', 'created_at', 'id'], name='message_community_created_idx'),
+            models.Index(fields=['community', 'seq'], name='message_community_seq_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.sender.username} : {self.content[:30]}...'
@@ -83,7 +91,8 @@ class Notification(BaseModel):
 
     NOTIFICATION_TYPES = (
         ('message', 'Message'),
-        ('new_course', 'New Course')
+        ('new_course', 'New Course'),
+        ('digest', 'Digest'),
     )
 
     recipient = models.ForeignKey(
@@ -97,5 +106,43 @@ class Notification(BaseModel):
     link = models.URLField(null=True, blank=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notification_recipient_idx'),
+            models.Index(fields=['recipient'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+            # Oldest first scans of the retention job
+            models.Index(fields=['created_at', 'id'], name='notification_created_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.recipient.username} - {self.notification_type}"
+
+
+
+class NotificationArchive(models.Model):
+    """
+    Notifications moved out of the inbox table by the retention job.
+
+    Stored in a table partitioned by month of created_at, created by the
+    migrations and extended with a new partition per month by the job.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    recipient = models.ForeignKey(
+        CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    community = models.ForeignKey(
+        Community, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', null=True
+    )
+    message = models.CharField(max_length=100, null=True)
+    notification_type = models.CharField(max_length=20)
+    link = models.URLField(null=True)
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        managed = False
+        db_table = 'community_notification_archive'
+
+    def __str__(self):
+        return f"Archived notification for {self.recipient_id} - {self.notification_type}"
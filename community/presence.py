@@ -0,0 +1,133 @@
+import asyncio
+import time
+from channels.layers import get_channel_layer
+from django_redis import get_redis_connection
+
+
+# Members count as online until this many seconds after their last heartbeat
+PRESENCE_TIMEOUT = 60
+# Clients are expected to send a heartbeat frame at least this often
+HEARTBEAT_INTERVAL = 25
+# Minimum number of seconds between two typing broadcasts of a connection
+TYPING_INTERVAL = 3
+
+
+def _online_key(community_id):
+    """Returns the sorted set of online members of a community, scored by presence expiry."""
+    return f'presence:{community_id}:online'
+
+
+def _connections_key(community_id):
+    """Returns the hash counting the open connections of each online member."""
+    return f'presence:{community_id}:connections'
+
+
+def _refresh(pipe, community_id, user_id):
+    """Queue the commands extending a member's presence on a pipeline."""
+    online_key = _online_key(community_id)
+    connections_key = _connections_key(community_id)
+    pipe.zadd(online_key, {user_id: time.time() + PRESENCE_TIMEOUT})
+    # Presence of a community nobody heartbeats to disappears on its own
+    pipe.expire(online_key, PRESENCE_TIMEOUT * 2)
+    pipe.expire(connections_key, PRESENCE_TIMEOUT * 2)
+
+
+def connect_member(community_id, user_id):
+    """
+    Register a new connection of a member.
+
+    Returns:
+        bool: True when the member just came online, i.e. had no live connection.
+    """
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.zscore(_online_key(community_id), user_id)
+    pipe.hincrby(_connections_key(community_id), user_id, 1)
+    _refresh(pipe, community_id, user_id)
+    expires_at = pipe.execute()[0]
+
+    if expires_at is None or expires_at < time.time():
+        # Connections counted by a node that died without disconnecting are forgotten
+        redis.hset(_connections_key(community_id), user_id, 1)
+        return True
+    return False
+
+
+def heartbeat_member(community_id, user_id):
+    """
+    Extend the presence of a member.
+
+    Returns:
+        bool: True when the member had been reaped and came back online.
+    """
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.zscore(_online_key(community_id), user_id)
+    _refresh(pipe, community_id, user_id)
+    expires_at = pipe.execute()[0]
+
+    if expires_at is None or expires_at < time.time():
+        redis.hset(_connections_key(community_id), user_id, 1)
+        return True
+    return False
+
+
+def disconnect_member(community_id, user_id):
+    """
+    Unregister a connection of a member.
+
+    Returns:
+        bool: True when it was the member's last connection and they went offline.
+    """
+    redis = get_redis_connection('default')
+    if redis.hincrby(_connections_key(community_id), user_id, -1) > 0:
+        return False
+    pipe = redis.pipeline()
+    pipe.hdel(_connections_key(community_id), user_id)
+    pipe.zrem(_online_key(community_id), user_id)
+    pipe.execute()
+    return True
+
+
+def reap_stale_members(community_id):
+    """
+    Remove the members whose presence expired, typically because their
+    daphne node went away without closing their connections. Run for every
+    community by reap_stale_presence_task.
+
+    Returns:
+        list: The ids of the removed members.
+    """
+    redis = get_redis_connection('default')
+    stale = redis.zrangebyscore(_online_key(community_id), '-inf', time.time())
+    if stale:
+        pipe = redis.pipeline()
+        pipe.zrem(_online_key(community_id), *stale)
+        pipe.hdel(_connections_key(community_id), *stale)
+        pipe.execute()
+    return [int(user_id) for user_id in stale]
+
+
+def get_present_community_ids():
+    """Returns the ids of the communities that have presence entries in Redis."""
+    keys = get_redis_connection('default').scan_iter(match=_online_key('*'))
+    return {int(key.decode().split(':')[1]) for key in keys}
+
+
+def get_online_member_ids(community_id):
+    """Returns the ids of the online members of a community."""
+    members = get_redis_connection('default').zrangebyscore(_online_key(community_id), time.time(), '+inf')
+    return [int(user_id) for user_id in members]
+
+
+async def send_presence_changes(slug, user_ids, status):
+    """Broadcast to a community chat that members came online or went offline."""
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*[
+        channel_layer.group_send(f'chat_{slug}', {
+            'type': 'presence',
+            'status': status,
+            'user': None,
+            'userID': user_id,
+        }) for user_id in user_ids
+    ])
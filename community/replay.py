@@ -0,0 +1,112 @@
+import json
+from django.db.models import Max
+from django_redis import get_redis_connection
+
+from .models import Message
+
+
+# Number of recent messages of a community kept in Redis for reconnecting clients
+RING_SIZE = 500
+# Largest gap served from the database; clients further behind reload the chat history
+REPLAY_LIMIT = 2000
+
+
+def _seq_key(community_id):
+    """Returns the Redis counter allocating the message sequence numbers of a community."""
+    return f'chat:{community_id}:seq'
+
+
+def _ring_key(community_id):
+    """Returns the sorted set holding the latest messages of a community, scored by seq."""
+    return f'chat:{community_id}:recent'
+
+
+def _acks_key(community_id):
+    """Returns the hash of the last seq each member acknowledged in a community."""
+    return f'chat:{community_id}:acks'
+
+
+def get_last_seq(community_id):
+    """Returns the seq of the last stored message of a community, 0 if it has none."""
+    return Message.objects.filter(community_id=community_id).aggregate(last=Max('seq'))['last'] or 0
+
+
+def ensure_sequence(community_id):
+    """Seed the sequence counter of a community from the database when Redis has none."""
+    key = _seq_key(community_id)
+    redis = get_redis_connection('default')
+    if not redis.exists(key):
+        redis.set(key, get_last_seq(community_id), nx=True)
+
+
+def record_message(community_id, frame):
+    """
+    Allocate the next seq of a community for an outgoing chat frame and keep
+    the frame in the community's ring buffer.
+
+    Returns:
+        int: The seq of the message, also set on the frame.
+    """
+    redis = get_redis_connection('default')
+    seq = redis.incr(_seq_key(community_id))
+    if seq == 1:
+        # The counter was lost; continue after the last stored message
+        last_seq = get_last_seq(community_id)
+        if last_seq:
+            seq = redis.incrby(_seq_key(community_id), last_seq)
+
+    frame['seq'] = seq
+    pipe = redis.pipeline()
+    pipe.zadd(_ring_key(community_id), {json.dumps(frame): seq})
+    pipe.zremrangebyrank(_ring_key(community_id), 0, -RING_SIZE - 1)
+    pipe.execute()
+    return seq
+
+
+def acknowledge(community_id, user_id, seq):
+    """Remember the last seq a member has received in a community."""
+    get_redis_connection('default').hset(_acks_key(community_id), user_id, seq)
+
+
+def get_acknowledged(community_id, user_id):
+    """Returns the last seq a member acknowledged in a community, or None."""
+    seq = get_redis_connection('default').hget(_acks_key(community_id), user_id)
+    return int(seq) if seq is not None else None
+
+
+def get_missed_messages(community_id, after_seq):
+    """
+    Returns the chat frames of a community sent after after_seq, oldest first.
+
+    Recent gaps are served from the Redis ring buffer alone; older messages
+    come from one range scan of the (community, seq) index.
+
+    Returns:
+        tuple: The frames, and False when the gap is larger than REPLAY_LIMIT
+        and the client has to reload the chat history instead.
+    """
+    ring = get_redis_connection('default').zrangebyscore(
+        _ring_key(community_id), f'({after_seq}', '+inf', withscores=True
+    )
+    frames = [json.loads(frame) for frame, _ in ring]
+    oldest_buffered = int(ring[0][1]) if ring else None
+    if oldest_buffered == after_seq + 1:
+        return frames, True
+
+    last_seq = int(get_redis_connection('default').get(_seq_key(community_id)) or 0)
+    if last_seq <= after_seq:
+        return frames, True
+    if last_seq - after_seq > REPLAY_LIMIT:
+        return [], False
+
+    stored = Message.objects.filter(community_id=community_id, seq__gt=after_seq)
+    if oldest_buffered is not None:
+        stored = stored.filter(seq__lt=oldest_buffered)
+    stored = stored.order_by('seq').values('seq', 'content', 'sender_id', 'sender__username')
+    return [{
+        'type': 'chat_message',
+        'content': message['content'],
+        'user': message['sender__username'],
+        'userID': message['sender_id'],
+        'seq': message['seq'],
+    } for message in stored] + frames, True
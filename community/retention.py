@@ -0,0 +1,131 @@
+from datetime import datetime, timezone
+from django.db import connection
+from django.db.models import Min
+
+from .models import Notification
+from .unread import reset_unread_counts
+
+
+NOTIFICATION_COLUMNS = 'id, created_at, updated_at, recipient_id, community_id, message, notification_type, link, is_read'
+
+# One statement per batch: takes the next %(limit)s old read notices in
+# (created_at, id) order after the given position and replaces those of each
+# recipient/community pair with a single read digest. Returns the number of
+# digests created and the position of the last notice of the batch.
+DIGEST_SQL = '''
+WITH batch AS (
+    SELECT id, created_at, recipient_id, community_id
+    FROM community_notification
+    WHERE (created_at, id) > (%(after_created_at)s, %(after_id)s) AND created_at < %(cutoff)s
+        AND is_read AND community_id IS NOT NULL AND notification_type <> 'digest'
+    ORDER BY created_at, id
+    LIMIT %(limit)s
+), groups AS (
+    SELECT recipient_id, community_id, count(*) AS total, max(created_at) AS latest, array_agg(id) AS ids
+    FROM batch
+    GROUP BY recipient_id, community_id
+    HAVING count(*) > 1
+), removed AS (
+    DELETE FROM community_notification
+    WHERE id IN (SELECT unnest(ids) FROM groups)
+), inserted AS (
+    INSERT INTO community_notification (created_at, updated_at, recipient_id, community_id, message, notification_type, link, is_read)
+    SELECT groups.latest, now(), groups.recipient_id, groups.community_id,
+        left(groups.total || ' messages in ' || community.name, 100), 'digest', '/community/' || community.slug, true
+    FROM groups
+    JOIN community_community community ON community.id = groups.community_id
+    RETURNING 1
+), last AS (
+    SELECT created_at, id FROM batch ORDER BY created_at DESC, id DESC LIMIT 1
+)
+SELECT (SELECT count(*) FROM inserted), (SELECT created_at FROM last), (SELECT id FROM last)
+'''
+
+# Moves up to %(limit)s notifications to the archive, skipping rows locked by inbox updates
+ARCHIVE_SQL = f'''
+WITH moved AS (
+    DELETE FROM community_notification
+    WHERE id IN (
+        SELECT id FROM community_notification
+        WHERE created_at < %(cutoff)s
+        ORDER BY created_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING {NOTIFICATION_COLUMNS}
+)
+INSERT INTO community_notification_archive ({NOTIFICATION_COLUMNS})
+SELECT {NOTIFICATION_COLUMNS} FROM moved
+RETURNING recipient_id, is_read
+'''
+
+
+def digest_read_notifications(cutoff, batch_size=1000):
+    """
+    Collapse the read notifications older than cutoff into one digest per
+    recipient and community and batch, walking them oldest first through
+    the (created_at, id) index, a batch per transaction.
+
+    Returns:
+        int: The number of digests created.
+    """
+    digests = 0
+    after_created_at, after_id = '-infinity', 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(DIGEST_SQL, {
+                'cutoff': cutoff,
+                'limit': batch_size,
+                'after_created_at': after_created_at,
+                'after_id': after_id,
+            })
+            created, after_created_at, after_id = cursor.fetchone()
+        digests += created
+        if after_id is None:
+            # The batch was empty: every old read notice has been seen
+            return digests
+
+
+def ensure_archive_partitions(start, end):
+    """
+    Create the monthly archive partitions covering start up to end.
+    """
+    year, month = start.year, start.month
+    with connection.cursor() as cursor:
+        while (year, month) <= (end.year, end.month):
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            lower = datetime(year, month, 1, tzinfo=timezone.utc)
+            upper = datetime(next_year, next_month, 1, tzinfo=timezone.utc)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS community_notification_archive_{year}_{month:02d} '
+                f'PARTITION OF community_notification_archive '
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            year, month = next_year, next_month
+
+
+def archive_notifications(cutoff, batch_size=5000):
+    """
+    Move the notifications older than cutoff into the monthly partitioned
+    archive, deleting them from the inbox table in batches, each in its own
+    short transaction.
+
+    Returns:
+        int: The number of notifications archived.
+    """
+    oldest = Notification.objects.filter(created_at__lt=cutoff).aggregate(oldest=Min('created_at'))['oldest']
+    if oldest is None:
+        return 0
+    ensure_archive_partitions(oldest, cutoff)
+
+    archived = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_SQL, {'cutoff': cutoff, 'limit': batch_size})
+            rows = cursor.fetchall()
+        if not rows:
+            return archived
+        archived += len(rows)
+
+        # Unread notifications left the inbox, so their counters are stale
+        reset_unread_counts({recipient_id for recipient_id, is_read in rows if not is_read})
@@ -0,0 +1,68 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from .models import Community
+
+
+MEMBERSHIP_ACTIONS = {
+    'post_add': 'joined',
+    'post_remove': 'left',
+    'post_clear': 'reload',
+}
+
+
+def broadcast_membership_change(slug, action, user_ids):
+    """
+    Tell the chat consumers of a community that its membership changed, so
+    they can update the member ids cached on the connection.
+    """
+    async_to_sync(get_channel_layer().group_send)(f'chat_{slug}', {
+        'type': 'membership_changed',
+        'action': action,
+        'user_ids': user_ids,
+    })
+
+
+@receiver(m2m_changed, sender=Community.participants.through)
+def community_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal receiver that broadcasts participant changes to the community's
+    chat consumers once the transaction commits.
+
+    Args:
+        sender: The intermediate model of Community.participants.
+        instance: The community (or the user, when reverse) being changed.
+        action (str): The m2m_changed action.
+        reverse (bool): True when the relation is changed from the user side.
+        pk_set (set): The primary keys added or removed, None when cleared.
+        **kwargs: Additional keyword arguments.
+    """
+    if action == 'pre_clear' and reverse:
+        # post_clear has no pk_set; remember the communities the user is leaving
+        instance._cleared_community_slugs = list(
+            Community.objects.filter(participants=instance).values_list('slug', flat=True)
+        )
+        return
+
+    if action not in MEMBERSHIP_ACTIONS:
+        return
+
+    if not reverse:
+        changes = [(instance.slug, list(pk_set or []))]
+    elif action == 'post_clear':
+        # The user left every community; reload the member ids of each
+        changes = [(slug, [instance.pk]) for slug in getattr(instance, '_cleared_community_slugs', [])]
+        instance._cleared_community_slugs = []
+    elif pk_set:
+        # The user joined or left the communities in pk_set
+        slugs = Community.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        changes = [(slug, [instance.pk]) for slug in slugs]
+    else:
+        return
+
+    for slug, user_ids in changes:
+        transaction.on_commit(
+            lambda slug=slug, user_ids=user_ids: broadcast_membership_change(slug, MEMBERSHIP_ACTIONS[action], user_ids)
+        )
@@ -0,0 +1,108 @@
+import asyncio
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from datetime import timedelta
+from django.conf import settings
+from django.utils.timezone import now
+
+from .models import Community, Notification
+from .unread import reset_unread_counts
+from .retention import digest_read_notifications, archive_notifications
+from .presence import get_present_community_ids, reap_stale_members, send_presence_changes
+
+
+@shared_task
+def fan_out_message_notifications(community_id, sender_id, sender_username):
+    """
+    Notify the members of a community about new messages from a sender.
+
+    Runs off the WebSocket path. Each member keeps a single unread notice per
+    community: members who already have one get it refreshed in one UPDATE,
+    the others get a new one in one bulk insert and are pushed a WebSocket
+    notification, sent concurrently over the channel layer.
+    """
+    community = Community.objects.filter(id=community_id).only('id', 'slug').first()
+    if community is None:
+        return 0
+
+    message = f'New message from {sender_username}'
+    link = f'/community/{community.slug}'
+
+    member_ids = set(community.participants.exclude(id=sender_id).values_list('id', flat=True))
+    unread = Notification.objects.filter(
+        community=community,
+        notification_type='new_message',
+        is_read=False,
+        recipient_id__in=member_ids,
+    )
+    already_notified = set(unread.values_list('recipient_id', flat=True))
+    unread.update(message=message, updated_at=now())
+
+    recipient_ids = member_ids - already_notified
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            community=community,
+            message=message,
+            notification_type='new_message',
+            link=link,
+        ) for recipient_id in recipient_ids
+    ])
+
+    notification_data = {
+        'type': 'new_message',
+        'message': message,
+        'community': community.slug,
+        'link': link,
+    }
+    reset_unread_counts(recipient_ids)
+    async_to_sync(send_member_notifications)(recipient_ids, notification_data)
+    return len(recipient_ids)
+
+
+async def send_member_notifications(recipient_ids, notification_data):
+    """Push a notification to the personal group of every recipient concurrently."""
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*[
+        channel_layer.group_send(f'user_{recipient_id}', {
+            'type': 'send_notification',
+            'data': notification_data,
+        }) for recipient_id in recipient_ids
+    ])
+
+
+@shared_task
+def compact_notifications_task():
+    """
+    Keep the notification inbox table bounded: collapse old read notifications
+    into per community digests, then archive the oldest notifications.
+    """
+    digests = digest_read_notifications(now() - timedelta(days=settings.NOTIFICATION_DIGEST_AFTER_DAYS))
+    archived = archive_notifications(now() - timedelta(days=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS))
+    return {'digests': digests, 'archived': archived}
+
+
+@shared_task
+def reap_stale_presence_task():
+    """
+    Drop the online members whose heartbeats stopped, e.g. because their
+    daphne node died, and announce them as offline to their communities.
+    """
+    stale = {}
+    for community_id in get_present_community_ids():
+        user_ids = reap_stale_members(community_id)
+        if user_ids:
+            stale[community_id] = user_ids
+    if not stale:
+        return 0
+
+    slugs = dict(Community.objects.filter(id__in=stale).values_list('id', 'slug'))
+
+    async def announce():
+        await asyncio.gather(*[
+            send_presence_changes(slugs[community_id], user_ids, 'offline')
+            for community_id, user_ids in stale.items() if community_id in slugs
+        ])
+    async_to_sync(announce)()
+    return sum(len(user_ids) for user_ids in stale.values())
@@ -1,3 +1,57 @@
+from unittest import mock
+
+import fakeredis
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import CustomUser
+from .models import Community, Message
+from .replay import get_missed_messages, record_message
+
+
+class GetMissedMessagesTests(TestCase):
+    """Chat frames replayed to a reconnecting client."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        for target, value in (
+            ('community.replay.get_redis_connection', mock.Mock(return_value=self.redis)),
+            ('community.replay.RING_SIZE', 3),
+            ('community.replay.REPLAY_LIMIT', 6),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.community = Community.objects.create(name='Community', slug='community')
+        self.user = CustomUser.objects.create(username='member', email='member@example.com', role='student')
+
+    def send(self, count):
+        """Stores and records count messages, as the chat consumer does."""
+        for _ in range(count):
+            frame = {'type': 'chat_message', 'content': 'hello', 'user': self.user.username, 'userID': self.user.id}
+            seq = record_message(self.community.id, frame)
+            Message.objects.create(community=self.community, sender=self.user, content=frame['content'], seq=seq)
+
+    def seqs(self, frames):
+        return [frame['seq'] for frame in frames]
+
+    def test_recent_gap_is_served_from_the_ring_buffer(self):
+        self.send(5)
+        with self.assertNumQueries(0):
+            frames, complete = get_missed_messages(self.community.id, 3)
+        self.assertTrue(complete)
+        self.assertEqual(self.seqs(frames), [4, 5])
+
+    def test_older_gap_is_completed_from_the_database(self):
+        self.send(5)
+        frames, complete = get_missed_messages(self.community.id, 0)
+        self.assertTrue(complete)
+        self.assertEqual(self.seqs(frames), [1, 2, 3, 4, 5])
+        self.assertEqual(frames[0]['user'], 'member')
+
+    def test_up_to_date_client_gets_nothing(self):
+        self.send(2)
+        self.assertEqual(get_missed_messages(self.community.id, 2), ([], True))
+
+    def test_gap_over_the_replay_limit_asks_for_a_reload(self):
+        self.send(8)
+        self.assertEqual(get_missed_messages(self.community.id, 1), ([], False))
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+
+from .models import Notification
+
+
+# Unread counters are rebuilt from the database when missing, and at least this often
+UNREAD_COUNT_TIMEOUT = 60 * 60
+
+
+def _unread_key(user_id):
+    """Returns the cache key of a user's unread notification counter."""
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    """
+    Returns the number of unread notifications of a user from the cached
+    counter, counting them through the partial unread index when it is missing.
+    """
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(key, count, UNREAD_COUNT_TIMEOUT)
+    return max(0, count)
+
+
+def decrement_unread_count(user_id, amount):
+    """Removes notifications marked as read from a user's cached counter."""
+    if amount:
+        try:
+            cache.decr(_unread_key(user_id), amount)
+        except ValueError:
+            # No counter cached; it is rebuilt on the next read
+            pass
+
+
+def reset_unread_counts(user_ids):
+    """Drops the cached counters of users who received notifications, in one round trip."""
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+
+
+def clear_unread_count(user_id):
+    """Sets the cached counter of a user whose inbox was cleared to zero."""
+    cache.set(_unread_key(user_id), 0, UNREAD_COUNT_TIMEOUT)
@@ -5,7 +5,8 @@ from .views import (
     JoinCommunityAPIView,
     ChatHistoryAPIView,
     exit_community,
-    NotificationViewSet
+    NotificationViewSet,
+    OnlineMembersAPIView
 )
 from rest_framework.routers import DefaultRouter
 
@@ -19,5 +20,6 @@ urlpatterns = [
     path('create-community/', CommunityCreateAPIView.as_view(), name='community-create'),
     path('community/<slug:slug>/join/', JoinCommunityAPIView.as_view(), name='join-community'),
     path('community/<slug:slug>/chat/', ChatHistoryAPIView.as_view(), name='chat-history'),
+    path('community/<slug:slug>/online/', OnlineMembersAPIView.as_view(), name='online-members'),
     path('community/<slug:slug>/exit/', exit_community, name='exit-community')
 ]
@@ -0,0 +1,21 @@
+from django.core.cache import cache
+
+from .tasks import fan_out_message_notifications
+
+
+# Messages a sender posts within this window share a single notification fan-out
+NOTIFICATION_COALESCE_SECONDS = 5
+
+
+def queue_message_notifications(community, sender):
+    """
+    Schedule the notification fan-out for a new message, at most once per
+    sender and community in every coalescing window.
+    """
+    key = f'notify:community:{community.id}:sender:{sender.id}'
+    if cache.add(key, 1, NOTIFICATION_COALESCE_SECONDS):
+        fan_out_message_notifications.apply_async(
+            (community.id, sender.id, sender.username),
+            countdown=NOTIFICATION_COALESCE_SECONDS,
+        )
+
@@ -1,13 +1,17 @@
+from asgiref.sync import async_to_sync
 from django.shortcuts import render, get_object_or_404
 from rest_framework import status, generics, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action
 from rest_framework.permissions import AllowAny
 
 from base.custom_permissions import IsTutor, IsStudent
-from base.custom_pagination_class import CustomMessagePagination
+from base.custom_pagination_class import CustomMessageCursorPagination, CustomNotificationCursorPagination
+from users.models import CustomUser
 from .models import Community, Message, Notification
+from .unread import get_unread_count, decrement_unread_count, clear_unread_count
+from .presence import get_online_member_ids, reap_stale_members, send_presence_changes
 from .serializer import (
     CommunitySerializer,
     MessageSerializer,
@@ -92,10 +96,11 @@ class JoinCommunityAPIView(APIView):
 
 class ChatHistoryAPIView(generics.ListAPIView):
     """
-    API view to retrieve the chat history of a community.
+    API view to retrieve the chat history of a community, latest messages
+    first. Follow the next cursor to load older messages.
     """
     serializer_class = MessageSerializer
-    pagination_class = CustomMessagePagination
+    pagination_class = CustomMessageCursorPagination
 
     def get_queryset(self):
         """
@@ -103,7 +108,30 @@ class ChatHistoryAPIView(generics.ListAPIView):
         """
         slug = self.kwargs['slug']
         community = get_object_or_404(Community, slug=slug)
-        return Message.objects.filter(community=community).order_by('created_at')
+        return Message.objects.filter(community=community).order_by('-created_at', '-id')
+
+
+class OnlineMembersAPIView(APIView):
+    """
+    API view to list the members of a community who are currently online.
+    Clients fetch it once and then follow the presence events of the chat.
+    """
+
+    def get(self, request, slug):
+        community = get_object_or_404(Community.objects.select_related('tutor'), slug=slug)
+        is_tutor = community.tutor is not None and community.tutor.user_id == request.user.id
+        if not is_tutor and not community.participants.filter(id=request.user.id).exists():
+            return Response({'error': 'You are not a member of this community'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        # Members of dead connections are dropped here and announced as offline
+        stale_ids = reap_stale_members(community.id)
+        if stale_ids:
+            async_to_sync(send_presence_changes)(community.slug, stale_ids, 'offline')
+
+        online_ids = get_online_member_ids(community.id)
+        members = CustomUser.objects.filter(id__in=online_ids).values('id', 'username')
+        return Response({'count': len(online_ids), 'members': list(members)}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -130,6 +158,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     """
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    pagination_class = CustomNotificationCursorPagination
 
     def get_queryset(self):
         """
@@ -142,6 +171,35 @@ class NotificationViewSet(viewsets.ModelViewSet):
         Mark a notification as read.
         """
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        updated = self.get_queryset().filter(pk=notification.pk, is_read=False).update(is_read=True)
+        decrement_unread_count(request.user.id, updated)
         return Response({'status': 'notification marked as read'}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Return the number of unread notifications, for the badge.
+        """
+        return Response({'unread_count': get_unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """
+        Mark the notifications with the given ids as read, in a single update.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'A list of notification ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = self.get_queryset().filter(pk__in=ids, is_read=False).update(is_read=True)
+        decrement_unread_count(request.user.id, updated)
+        return Response({'marked_read': updated}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='mark-all-read')
+    def mark_all_read(self, request):
+        """
+        Mark every unread notification of the user as read, in a single update.
+        """
+        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        clear_unread_count(request.user.id)
+        return Response({'marked_read': updated}, status=status.HTTP_200_OK)
@@ -0,0 +1,96 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Option, Participant
+
+
+# Seconds a worker trusts its in-process copy of an answer key before re-reading Redis
+LOCAL_ANSWER_KEY_TIMEOUT = 60
+# Seconds an answer key stays in Redis
+ANSWER_KEY_TIMEOUT = 60 * 60 * 6
+
+# contest id -> (answer key, time it was loaded)
+_local_answer_keys = {}
+
+
+def _answer_key_cache_key(contest_id):
+    """Returns the cache key of a contest's answer key."""
+    return f'contest:{contest_id}:answer_key'
+
+
+def load_answer_key(contest):
+    """
+    Build the answer key of a contest from the database in one query.
+
+    The answer key maps each question id to its option ids, its correct
+    option ids and the integer points it is worth, max_points split evenly
+    over the contest's total_questions.
+    """
+    questions = {}
+    options = Option.objects.filter(question__contest_id=contest.id).order_by('question_id', 'id')
+    for question_id, option_id, is_correct in options.values_list('question_id', 'id', 'is_correct'):
+        question = questions.setdefault(question_id, {'options': set(), 'correct': set(), 'points': 0})
+        question['options'].add(option_id)
+        if is_correct:
+            question['correct'].add(option_id)
+
+    if contest.total_questions:
+        points = contest.max_points // contest.total_questions
+        for question in questions.values():
+            question['points'] = points
+    return questions
+
+
+def get_answer_key(contest):
+    """
+    Returns the answer key of a contest, from the process-local copy, then
+    Redis, and only then the database.
+    """
+    local = _local_answer_keys.get(contest.id)
+    if local is not None and local[1] > time.monotonic() - LOCAL_ANSWER_KEY_TIMEOUT:
+        return local[0]
+
+    key = _answer_key_cache_key(contest.id)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = load_answer_key(contest)
+        cache.set(key, answer_key, ANSWER_KEY_TIMEOUT)
+    _local_answer_keys[contest.id] = (answer_key, time.monotonic())
+    return answer_key
+
+
+def invalidate_answer_key(contest_id):
+    """
+    Drop the cached answer key of a contest. Other workers pick up the change
+    once their local copy expires.
+    """
+    cache.delete(_answer_key_cache_key(contest_id))
+    _local_answer_keys.pop(contest_id, None)
+
+
+def grade(answer_key, question_id, option_id):
+    """
+    Grade an answer against the answer key.
+
+    Returns:
+        tuple: (is_correct, points earned), or None when the option does not
+        belong to a question of the contest.
+    """
+    question = answer_key.get(question_id)
+    if question is None or option_id not in question['options']:
+        return None
+    is_correct = option_id in question['correct']
+    return is_correct, question['points'] if is_correct else 0
+
+
+def add_points(participant_id, points):
+    """Add points to a participant's score with a single UPDATE, returning the new score."""
+    with transaction.atomic():
+        participants = Participant.objects.filter(pk=participant_id)
+        if not participants.update(score=F('score') + points, updated_at=timezone.now()):
+            return None
+        # The UPDATE holds the row lock until commit, so this reads our own write
+        return participants.values_list('score', flat=True).get()
@@ -0,0 +1,338 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from users.models import CustomUser
+from .models import Contest, Leaderboard, LeaderboardRollup, Participant
+
+
+# Sorted set scores are points * TIEBREAK_SCALE plus a tiebreak that shrinks with
+# the milliseconds a participant took to reach their points, so equal points rank
+# the fastest first. Exact for up to ~900k points and ~115 days of contest time.
+TIEBREAK_SCALE = 10 ** 10
+# Seconds a finished contest's board stays in Redis after being written to the database
+FINISHED_BOARD_TIMEOUT = 60 * 60 * 24
+# Rows written per upsert statement when a leaderboard is finalized
+FINALIZE_BATCH_SIZE = 1000
+
+# period_start of the all time rollup
+ALL_TIME_START = date(1970, 1, 1)
+# Seconds the Redis mirror of a weekly or monthly rollup outlives its last update
+PERIOD_MIRROR_TIMEOUT = {'week': 60 * 60 * 24 * 14, 'month': 60 * 60 * 24 * 62}
+# Seconds a request may take to load a mirror before another one may try
+MIRROR_LOAD_TIMEOUT = 60 * 5
+
+# Adds the final scores of a contest to the rollups of its participants in one
+# statement, returning the new totals
+ROLLUP_SQL = '''
+INSERT INTO contest_leaderboardrollup (created_at, updated_at, user_id, period, period_start, score, contests)
+SELECT now(), now(), leaderboard.user_id, periods.period, periods.period_start, leaderboard.score, 1
+FROM contest_leaderboard leaderboard
+CROSS JOIN (VALUES ('all', %(all)s::date), ('week', %(week)s::date), ('month', %(month)s::date)) AS periods (period, period_start)
+WHERE leaderboard.contest_id = %(contest_id)s AND leaderboard.user_id IS NOT NULL
+ON CONFLICT (user_id, period, period_start) DO UPDATE
+SET score = contest_leaderboardrollup.score + EXCLUDED.score,
+    contests = contest_leaderboardrollup.contests + 1,
+    updated_at = EXCLUDED.updated_at
+RETURNING user_id, period, score
+'''
+
+
+def _board_key(contest_id):
+    """Returns the sorted set ranking the participants of a contest."""
+    return f'contest:{contest_id}:leaderboard'
+
+
+def _board_score(points, elapsed):
+    """Combine points and the time taken to reach them into one sorted set score."""
+    elapsed_ms = min(int(elapsed.total_seconds() * 1000), TIEBREAK_SCALE - 1)
+    return int(points) * TIEBREAK_SCALE + (TIEBREAK_SCALE - 1 - elapsed_ms)
+
+
+def _points(board_score):
+    """Returns the points encoded in a sorted set score."""
+    return int(board_score // TIEBREAK_SCALE)
+
+
+def add_participant(contest_id, user_id):
+    """Put a new participant on the live leaderboard with no points."""
+    get_redis_connection('default').zadd(_board_key(contest_id), {user_id: 0}, nx=True)
+
+
+def record_score(contest_id, user_id, points, elapsed):
+    """
+    Set the points of a participant on the live leaderboard; elapsed is the
+    time from joining to the submission that earned the points, breaking
+    ties between equal points.
+    """
+    # Scores only grow: GT keeps a slower concurrent request from writing a lower score last
+    get_redis_connection('default').zadd(_board_key(contest_id), {user_id: _board_score(points, elapsed)}, gt=True)
+
+
+def get_rank(contest_id, user_id):
+    """
+    Returns the rank and points of a participant, in O(log N).
+
+    Returns:
+        tuple: (rank, points), or None when the user is not on the board.
+    """
+    pipe = get_redis_connection('default').pipeline()
+    pipe.zrevrank(_board_key(contest_id), user_id)
+    pipe.zscore(_board_key(contest_id), user_id)
+    rank, board_score = pipe.execute()
+    if rank is None:
+        return None
+    return rank + 1, _points(board_score)
+
+
+def get_top(contest_id, limit=10, offset=0):
+    """Returns the (rank, user_id, points) of the leading participants of a contest."""
+    entries = get_redis_connection('default').zrevrange(
+        _board_key(contest_id), offset, offset + limit - 1, withscores=True
+    )
+    return [
+        (rank, int(user_id), _points(board_score))
+        for rank, (user_id, board_score) in enumerate(entries, start=offset + 1)
+    ]
+
+
+def live_leaderboard(contest, user, limit=10):
+    """
+    Returns the leading participants of a running contest and the rank of
+    the user from the Redis leaderboard, with a single query for usernames.
+    """
+    top = get_top(contest.id, limit)
+    if not top:
+        rebuild_board(contest)
+        top = get_top(contest.id, limit)
+    usernames = dict(CustomUser.objects.filter(id__in=[user_id for _, user_id, _ in top]).values_list('id', 'username'))
+
+    my_entry = None
+    if user.is_authenticated:
+        my_rank = get_rank(contest.id, user.id)
+        if my_rank:
+            my_entry = {'rank': my_rank[0], 'score': my_rank[1]}
+
+    return {
+        'top': [
+            {'rank': rank, 'score': points, 'user': {'id': user_id, 'username': usernames.get(user_id)}}
+            for rank, user_id, points in top
+        ],
+        'me': my_entry,
+    }
+
+
+def get_leaderboard_entries(contests, limit=10):
+    """
+    Returns the leaderboard of each contest as Leaderboard rows, by contest id.
+
+    Finished contests get their stored rows. Running contests get unsaved
+    rows for their leading participants, read from the Redis boards in one
+    pipeline, so both serialize to the same shape. Users and stored rows
+    take one query each, however many contests there are.
+    """
+    entries = defaultdict(list)
+    finished = [contest for contest in contests if contest.status == 'finished']
+    running = [contest for contest in contests if contest.status != 'finished']
+
+    stored = Leaderboard.objects.filter(contest__in=finished).select_related('user', 'contest').order_by('contest_id', 'rank')
+    for entry in stored:
+        entries[entry.contest_id].append(entry)
+    if not running:
+        return entries
+
+    pipe = get_redis_connection('default').pipeline()
+    for contest in running:
+        pipe.zrevrange(_board_key(contest.id), 0, limit - 1, withscores=True)
+    boards = {}
+    for contest, board in zip(running, pipe.execute()):
+        if not board:
+            rebuild_board(contest)
+            board = get_redis_connection('default').zrevrange(_board_key(contest.id), 0, limit - 1, withscores=True)
+        boards[contest] = [(int(user_id), _points(board_score)) for user_id, board_score in board]
+
+    users = CustomUser.objects.in_bulk({user_id for board in boards.values() for user_id, _ in board})
+    for contest, board in boards.items():
+        entries[contest.id] = [
+            Leaderboard(contest=contest, user=users[user_id], score=points, rank=rank)
+            for rank, (user_id, points) in enumerate(board, start=1) if user_id in users
+        ]
+    return entries
+
+
+def rebuild_board(contest):
+    """
+    Load the live leaderboard of a contest from its participants, e.g. after
+    Redis lost it. Like record_score, ties are broken by the time from
+    joining to the last submission that earned points.
+    """
+    participants = Participant.objects.filter(contest=contest)\
+            .annotate(last_scored_at=Max('submissions__created_at', filter=Q(submissions__is_correct=True)))\
+            .values_list('user_id', 'score', 'created_at', 'last_scored_at')
+    board = {
+        user_id: _board_score(score, (last_scored_at or created_at) - created_at)
+        for user_id, score, created_at, last_scored_at in participants
+    }
+    if board:
+        get_redis_connection('default').zadd(_board_key(contest.id), board)
+
+
+def finalize_leaderboard(contest):
+    """
+    Write the final ranking of a finished contest to the Leaderboard table,
+    in batched upserts, from the live leaderboard.
+    """
+    redis = get_redis_connection('default')
+    if not redis.exists(_board_key(contest.id)):
+        rebuild_board(contest)
+
+    ranking = redis.zrevrange(_board_key(contest.id), 0, -1, withscores=True)
+    scores = dict(Participant.objects.filter(contest=contest).values_list('user_id', 'score'))
+    entries = [
+        Leaderboard(contest=contest, user_id=int(user_id), score=scores.get(int(user_id), _points(board_score)), rank=rank)
+        for rank, (user_id, board_score) in enumerate(ranking, start=1)
+    ]
+
+    with transaction.atomic():
+        Leaderboard.objects.bulk_create(
+            entries,
+            batch_size=FINALIZE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['contest', 'user'],
+            update_fields=['score', 'rank', 'updated_at'],
+        )
+        rollup_contest_scores(contest)
+    redis.expire(_board_key(contest.id), FINISHED_BOARD_TIMEOUT)
+    return len(entries)
+
+
+def get_period_starts(day):
+    """Returns the start of every leaderboard period a day belongs to."""
+    return {
+        'all': ALL_TIME_START,
+        'week': day - timedelta(days=day.weekday()),
+        'month': day.replace(day=1),
+    }
+
+
+def _global_key(period, period_start):
+    """Returns the sorted set mirroring the rollup of a leaderboard period."""
+    return f'leaderboard:global:{period}:{period_start.isoformat()}'
+
+
+def rollup_contest_scores(contest):
+    """
+    Add the final scores of a finished contest to the all time, weekly and
+    monthly rollups, exactly once, and to their Redis mirrors after commit.
+    """
+    with transaction.atomic():
+        if not Contest.objects.filter(id=contest.id, scores_rolled_up=False).update(scores_rolled_up=True):
+            return
+        period_starts = get_period_starts(timezone.localdate(contest.end_time or timezone.now()))
+        with connection.cursor() as cursor:
+            cursor.execute(ROLLUP_SQL, {**period_starts, 'contest_id': contest.id})
+            totals = cursor.fetchall()
+
+        transaction.on_commit(lambda: mirror_scores(period_starts, totals))
+
+
+def mirror_scores(period_starts, totals):
+    """
+    Write new rollup totals to the Redis mirrors. While a mirror is being
+    loaded they go to its staging set so the swap keeps them; mirrors not
+    loaded at all are left to load_mirror.
+
+    Args:
+        period_starts: the period_start of each period, from get_period_starts.
+        totals: (user_id, period, score) rows, score being the new total.
+    """
+    redis = get_redis_connection('default')
+    by_period = defaultdict(dict)
+    for user_id, period, score in totals:
+        by_period[period][user_id] = score
+
+    for period, scores in by_period.items():
+        key = _global_key(period, period_starts[period])
+
+        def write(pipe):
+            # WATCHed, so a swap between the checks and the write retries them
+            loading = pipe.exists(f'{key}:loading')
+            loaded = pipe.exists(key)
+            pipe.multi()
+            if loading or loaded:
+                target = f'{key}:staging' if loading else key
+                # Totals only grow: GT keeps the newer of a load and a rollup whatever their order
+                pipe.zadd(target, scores, gt=True)
+                if period in PERIOD_MIRROR_TIMEOUT:
+                    pipe.expire(target, PERIOD_MIRROR_TIMEOUT[period])
+
+        redis.transaction(write, key, f'{key}:loading')
+
+
+def load_mirror(period, period_start):
+    """
+    Load the Redis mirror of a rollup from the database, swapping it in
+    atomically. Rollups committed during the load are kept by mirror_scores
+    writing them to the staging set too.
+
+    Returns:
+        bool: whether the mirror is loaded; False while another request loads it.
+    """
+    key = _global_key(period, period_start)
+    redis = get_redis_connection('default')
+    if redis.exists(key):
+        return True
+    # Set before reading the database, so a rollup it misses is mirrored to staging
+    if not redis.set(f'{key}:loading', 1, nx=True, ex=MIRROR_LOAD_TIMEOUT):
+        return False
+
+    rows = LeaderboardRollup.objects.filter(period=period, period_start=period_start).values_list('user_id', 'score')
+    staging_key = f'{key}:staging'
+    pipe = redis.pipeline(transaction=False)
+    count, chunk = 0, {}
+    for user_id, score in rows.iterator(chunk_size=5000):
+        chunk[user_id] = score
+        count += 1
+        if len(chunk) == 5000:
+            pipe.zadd(staging_key, chunk, gt=True)
+            chunk = {}
+    if chunk:
+        pipe.zadd(staging_key, chunk, gt=True)
+    pipe.execute()
+
+    pipe = redis.pipeline()
+    if count:
+        pipe.rename(staging_key, key)
+        if period in PERIOD_MIRROR_TIMEOUT:
+            pipe.expire(key, PERIOD_MIRROR_TIMEOUT[period])
+    pipe.delete(f'{key}:loading')
+    pipe.execute()
+    return bool(count)
+
+
+def get_global_rank(user_id, period, period_start):
+    """
+    Returns the rank and score of a user on a global leaderboard period from
+    the Redis mirror, in O(log N).
+
+    Returns:
+        tuple: (rank, score), or None when the user has no score in the period.
+    """
+    if not load_mirror(period, period_start):
+        # Another request is loading the mirror, or the period has no scores yet
+        rollups = LeaderboardRollup.objects.filter(period=period, period_start=period_start)
+        score = rollups.filter(user_id=user_id).values_list('score', flat=True).first()
+        if score is None:
+            return None
+        return rollups.filter(score__gt=score).count() + 1, score
+
+    pipe = get_redis_connection('default').pipeline()
+    pipe.zrevrank(_global_key(period, period_start), user_id)
+    pipe.zscore(_global_key(period, period_start), user_id)
+    rank, score = pipe.execute()
+    if rank is None:
+        return None
+    return rank + 1, int(score)
@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-18 09:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Roll up the scores of the contests that already finished, per user and period
+BACKFILL_ROLLUPS = """
+INSERT INTO contest_leaderboardrollup (created_at, updated_at, user_id, period, period_start, score, contests)
+SELECT now(), now(), leaderboard.user_id, periods.period, periods.period_start, sum(leaderboard.score), count(*)
+FROM contest_leaderboard leaderboard
+JOIN contest_contest contest ON contest.id = leaderboard.contest_id
+CROSS JOIN LATERAL (VALUES
+    ('all', DATE '1970-01-01'),
+    ('week', date_trunc('week', coalesce(contest.end_time, contest.created_at) AT TIME ZONE %s)::date),
+    ('month', date_trunc('month', coalesce(contest.end_time, contest.created_at) AT TIME ZONE %s)::date)
+) AS periods (period, period_start)
+WHERE contest.status = 'finished' AND leaderboard.user_id IS NOT NULL
+GROUP BY leaderboard.user_id, periods.period, periods.period_start
+"""
+
+MARK_ROLLED_UP = "UPDATE contest_contest SET scores_rolled_up = true WHERE status = 'finished'"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0006_alter_contest_difficulty_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='scores_rolled_up',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('period', models.CharField(choices=[('all', 'All time'), ('week', 'Weekly'), ('month', 'Monthly')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('score', models.IntegerField(default=0)),
+                ('contests', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start', '-score', 'user'], name='rollup_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'period_start'), name='rollup_user_period_uniq')],
+            },
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_ROLLUPS, [settings.TIME_ZONE, settings.TIME_ZONE]), MARK_ROLLED_UP],
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+# Keep only the first submission of a participant for each question
+DELETE_DUPLICATE_SUBMISSIONS = """
+DELETE FROM contest_submission duplicate
+USING contest_submission first
+WHERE duplicate.participant_id = first.participant_id
+    AND duplicate.question_id = first.question_id
+    AND duplicate.id > first.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0007_leaderboard_rollup'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATE_SUBMISSIONS, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('participant', 'question'), name='submission_participant_question_uniq'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0008_submission_unique'),
+        ('course', '0023_progress_counts'),
+        ('user_profile', '0005_alter_tutor_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contest',
+            index=models.Index(fields=['status', 'start_time'], name='contest_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contest',
+            index=models.Index(fields=['status', 'end_time'], name='contest_status_end_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0009_contest_status_indexes'),
+        ('course', '0024_alter_module_video'),
+        ('user_profile', '0005_alter_tutor_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contest',
+            index=models.Index(condition=models.Q(('scores_rolled_up', False), ('status', 'finished')), fields=['id'], name='contest_unfinalized_idx'),
+        ),
+    ]
@@ -28,8 +28,21 @@ class Contest(BaseModel):
     difficulty_level = models.CharField(blank=True, max_length=50)
     time_limit = models.DurationField(null=True, blank=True, help_text="Time limit for contest participation (e.g., 00:10:00 for 10 minutes).")
     status = models.CharField(choices=STATUS_CHOICES, max_length=10, null=True)
+    # Set once the final scores have been added to the global leaderboard rollups
+    scores_rolled_up = models.BooleanField(default=False)
     participants = models.ManyToManyField(CustomUser, through='Participant', blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'start_time'], name='contest_status_start_idx'),
+            models.Index(fields=['status', 'end_time'], name='contest_status_end_idx'),
+            # Finished contests whose leaderboard is not finalized yet, picked up by the sweep
+            models.Index(
+                fields=['id'], name='contest_unfinalized_idx',
+                condition=models.Q(status='finished', scores_rolled_up=False),
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         """Override save method to automatically generate a unique slug based on the contest name."""
         if not self.slug or Contest.objects.filter(pk=self.pk, name=self.name).exists() == False:
@@ -92,6 +105,11 @@ class Submission(BaseModel):
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE, null=True)
     is_correct = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['participant', 'question'], name='submission_participant_question_uniq'),
+        ]
+
     def __str__(self) -> str:
         """Return a string representation of the participant's username and the question text."""
         return f"{self.participant.user.username} - {self.question.question_text}"
@@ -111,3 +129,32 @@ class Leaderboard(BaseModel):
     def __str__(self) -> str:
         """Return a string representation of the user's username, contest name, and rank."""
         return f"{self.user.username} - {self.contest.name} - Rank: {self.rank}"
+
+
+class LeaderboardRollup(BaseModel):
+    """Model accumulating the contest scores of a user over a leaderboard period."""
+
+    PERIOD_CHOICES = (
+        ('all', 'All time'),
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='leaderboard_rollups')
+    period = models.CharField(choices=PERIOD_CHOICES, max_length=10)
+    # First day of the week or month; a fixed date for the all time rollup
+    period_start = models.DateField()
+    score = models.IntegerField(default=0)
+    contests = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'period_start'], name='rollup_user_period_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'period_start', '-score', 'user'], name='rollup_rank_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """Return a string representation of the user's username, period and score."""
+        return f"{self.user.username} - {self.period} {self.period_start} - {self.score}"
@@ -1,8 +1,9 @@
 from rest_framework import serializers 
-from .models import Contest, Question, Option, Participant, Submission, Leaderboard
+from .models import Contest, Question, Option, Participant, Submission, Leaderboard, LeaderboardRollup
 from course.serializers import CategorySerializer
 from users.api.user_serializers import UserSerializers
 from course.models import Category
+from .leaderboard import get_leaderboard_entries
 from django.utils import timezone
 
 
@@ -92,6 +93,7 @@ class ContestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contest
         fields = '__all__'
+        read_only_fields = ['scores_rolled_up']
 
     def validate(self, attrs):
         """Validate the contest fields."""
@@ -192,9 +194,14 @@ class ContestSerializer(serializers.ModelSerializer):
         return False
 
     def get_leaderboard(self, obj):
-        """Retrieve the leaderboard for the contest."""
-        leaderboard = Leaderboard.objects.filter(contest=obj).order_by('rank')
-        return LeaderboardSerializer(leaderboard, many=True).data
+        """
+        Retrieve the leaderboard for the contest: the stored ranking once it
+        finishes, the leading participants of the live board until then.
+        """
+        preloaded = self.context.get('leaderboards')
+        if preloaded is None:
+            preloaded = get_leaderboard_entries([obj])
+        return LeaderboardSerializer(preloaded.get(obj.id, []), many=True).data
 
     def set_contest_status(self, validated_data):
         """Set the status of the contest based on the current time."""
@@ -226,6 +233,20 @@ class SubmissionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class AnswerSerializer(serializers.Serializer):
+    """Serializer validating one answer of a batch submission."""
+
+    question_id = serializers.IntegerField()
+    selected_option_id = serializers.IntegerField()
+
+
+class BatchSubmissionSerializer(serializers.Serializer):
+    """Serializer validating all the answers of a participant, or an autosave delta of them."""
+
+    participant_id = serializers.IntegerField()
+    answers = AnswerSerializer(many=True, allow_empty=False, max_length=500)
+
+
 class LeaderboardSerializer(serializers.ModelSerializer):
     """Serializer for the Leaderboard model, including user data and contest details."""
 
@@ -244,3 +265,14 @@ class LeaderboardSerializer(serializers.ModelSerializer):
             "id": contest.id,
             "name": contest.name
         }
+
+
+class LeaderboardRollupSerializer(serializers.ModelSerializer):
+    """Serializer for a global leaderboard entry."""
+
+    user__username = serializers.CharField(source='user.username', read_only=True)
+    total_score = serializers.IntegerField(source='score', read_only=True)
+
+    class Meta:
+        model = LeaderboardRollup
+        fields = ['user_id', 'user__username', 'total_score', 'contests']
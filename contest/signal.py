@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Contest, Question, Option
+from .grading import invalidate_answer_key
+from .tasks import apply_contest_transitions_task, schedule_transition
+
+
+@receiver(post_save, sender=Contest)
+def refresh_contest_answer_key(sender, instance, created, **kwargs):
+    """
+    Signal receiver that drops the cached answer key of an updated contest,
+    whose max_points may have changed.
+    """
+    if not created:
+        invalidate_answer_key(instance.id)
+
+
+@receiver(post_save, sender=Contest)
+def schedule_contest_transitions(sender, instance, **kwargs):
+    """
+    Signal receiver that queues the start and end transitions of a saved
+    contest, or the finalization of a contest saved as finished, once the
+    save is committed.
+    """
+    if instance.status == 'finished':
+        if not instance.scores_rolled_up:
+            # Finished directly by an edit; finalize like a contest that reached its end time
+            transaction.on_commit(apply_contest_transitions_task.delay)
+        return
+
+    def schedule():
+        schedule_transition(instance.id, instance.start_time)
+        schedule_transition(instance.id, instance.end_time)
+    transaction.on_commit(schedule)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def refresh_question_answer_key(sender, instance, **kwargs):
+    """Signal receiver that drops the cached answer key when a question changes."""
+    if instance.contest_id:
+        invalidate_answer_key(instance.contest_id)
+
+
+@receiver([post_save, post_delete], sender=Option)
+def refresh_option_answer_key(sender, instance, **kwargs):
+    """Signal receiver that drops the cached answer key when an option changes."""
+    contest_id = Question.objects.filter(id=instance.question_id).values_list('contest_id', flat=True).first()
+    if contest_id:
+        invalidate_answer_key(contest_id)
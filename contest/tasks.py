@@ -1,33 +1,116 @@
+import logging
+from datetime import timedelta
 from celery import shared_task
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from .models import Contest
 from django.utils.timezone import now
-from django.core.cache import cache
+from base.custom_cache import invalidate_tags
+from .leaderboard import finalize_leaderboard
 
 
-@shared_task
-def update_contest_status_task():
+# Transitions are queued as ETA tasks at most this far ahead, below the broker's
+# visibility timeout; later ones are queued by the periodic sweep when they come close
+TRANSITION_ETA_HORIZON = timedelta(minutes=50)
+
+logger = logging.getLogger(__name__)
+
+
+def _transition(queryset, status, current_time):
+    """
+    Move the contests of the queryset to status with one indexed UPDATE,
+    returning their ids. Rows locked by a concurrent run are skipped.
+    """
+    with transaction.atomic():
+        contest_ids = list(queryset.select_for_update(skip_locked=True).values_list('id', flat=True))
+        if contest_ids:
+            Contest.objects.filter(id__in=contest_ids).update(status=status, updated_at=current_time)
+    return contest_ids
+
+
+def finalize_finished_contests():
+    """
+    Finalize the leaderboard of every finished contest whose scores are not
+    rolled up yet: the ones just finished, the ones finished directly by an
+    edit and the ones a failed run left behind.
+
+    A contest that fails is logged and retried by the next run, without
+    holding up the others.
+
+    Returns:
+        int: The number of contests finalized.
+    """
+    finalized = 0
+    for contest in Contest.objects.filter(status='finished', scores_rolled_up=False).order_by('id'):
+        try:
+            finalize_leaderboard(contest)
+            finalized += 1
+        except Exception:
+            logger.exception('Failed to finalize the leaderboard of contest %s', contest.id)
+    return finalized
+
+
+def apply_contest_transitions():
+    """
+    Start and finish the contests that are due, finalize the leaderboards
+    of the finished ones and invalidate the contest lists if anything changed.
+
+    The work depends on the number of transitions, not on the number of contests.
+    """
+    current_time = now()
+    not_finished = Q(status__in=['scheduled', 'ongoing']) | Q(status__isnull=True)
+
+    finished_ids = _transition(Contest.objects.filter(not_finished, end_time__lte=current_time), 'finished', current_time)
+    started_ids = _transition(
+        Contest.objects.filter(Q(status='scheduled') | Q(status__isnull=True), start_time__lte=current_time, end_time__gt=current_time),
+        'ongoing',
+        current_time,
+    )
+
+    if finished_ids or started_ids:
+        invalidate_tags('contests')
+
+    finalized = finalize_finished_contests()
+    return {'started': len(started_ids), 'finished': len(finished_ids), 'finalized': finalized}
+
+
+def schedule_transition(contest_id, eta):
+    """Queue a transition run at eta when it is within the horizon and not queued yet."""
+    current_time = now()
+    if eta is None or eta <= current_time or eta - current_time > TRANSITION_ETA_HORIZON:
+        return False
+    if not cache.add(f'contest:{contest_id}:transition:{int(eta.timestamp())}', 1, int(TRANSITION_ETA_HORIZON.total_seconds())):
+        return False
+    apply_contest_transitions_task.apply_async(eta=eta)
+    return True
+
+
+def schedule_upcoming_transitions():
+    """Queue the transitions of the contests starting or ending within the horizon."""
     current_time = now()
+    horizon = current_time + TRANSITION_ETA_HORIZON
+    starting = Contest.objects.filter(status='scheduled', start_time__gt=current_time, start_time__lte=horizon)
+    ending = Contest.objects.filter(status__in=['scheduled', 'ongoing'], end_time__gt=current_time, end_time__lte=horizon)
 
-    # Fetch relevant contests based on their start and end times
-    contests = Contest.objects.all().exclude(status='finished')
-
-    for contest in contests:
-        updated_status = None
-
-        if contest.start_time <= current_time <= contest.end_time:
-            if contest.status != 'ongoing':
-                updated_status = 'ongoing'
-        elif current_time > contest.end_time:
-            if contest.status != 'finished':
-                updated_status = 'finished'
-        else:  # current_time < contest.start_time
-            if contest.status != 'scheduled':
-                updated_status = 'scheduled'
-
-        # Update contest status if it has changed
-        if updated_status:
-            contest.status = updated_status
-            contest.save()
-
-    # Clear the cache only once after processing all contests
-    cache.clear()
+    for contest_id, start_time in starting.values_list('id', 'start_time'):
+        schedule_transition(contest_id, start_time)
+    for contest_id, end_time in ending.values_list('id', 'end_time'):
+        schedule_transition(contest_id, end_time)
+
+
+@shared_task
+def apply_contest_transitions_task():
+    """Runs at the start or end time of a contest, queued by schedule_transition."""
+    return apply_contest_transitions()
+
+
+@shared_task
+def update_contest_status_task():
+    """
+    Periodic sweep: apply any transition that was missed, e.g. while the
+    workers were down, and queue the ones coming up within the horizon.
+    """
+    result = apply_contest_transitions()
+    schedule_upcoming_transitions()
+    return result
@@ -1,3 +1,98 @@
+from datetime import timedelta
+from unittest import mock
+
+import fakeredis
 from django.test import TestCase
+from django.utils import timezone
+
+from users.models import CustomUser
+from .grading import add_points, load_answer_key
+from .leaderboard import ALL_TIME_START, finalize_leaderboard, record_score
+from .models import Contest, Leaderboard, LeaderboardRollup, Option, Participant, Question
+
+
+def make_contest(name='Contest', **kwargs):
+    """Creates a contest that ended a minute ago."""
+    now = timezone.now()
+    defaults = {
+        'name': name,
+        'total_questions': 3,
+        'max_points': 10,
+        'start_time': now - timedelta(hours=1),
+        'end_time': now - timedelta(minutes=1),
+        'status': 'finished',
+    }
+    return Contest.objects.create(**{**defaults, **kwargs})
+
+
+class FinalizeLeaderboardTests(TestCase):
+    """The final ranking of a contest written from the live leaderboard."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('contest.leaderboard.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.contest = make_contest()
+        self.users = [
+            CustomUser.objects.create(username=f'player{i}', email=f'player{i}@example.com', role='student')
+            for i in range(3)
+        ]
+
+    def join(self, user, score, elapsed):
+        participant = Participant.objects.create(contest=self.contest, user=user, score=score)
+        record_score(self.contest.id, user.id, score, timedelta(seconds=elapsed))
+        return participant
+
+    def ranking(self):
+        return list(Leaderboard.objects.filter(contest=self.contest).order_by('rank').values_list('user__username', 'score', 'rank'))
+
+    def test_ranks_by_points_then_time_taken(self):
+        self.join(self.users[0], 5, elapsed=10)
+        self.join(self.users[1], 10, elapsed=30)
+        self.join(self.users[2], 10, elapsed=20)
+
+        self.assertEqual(finalize_leaderboard(self.contest), 3)
+        self.assertEqual(self.ranking(), [('player2', 10, 1), ('player1', 10, 2), ('player0', 5, 3)])
+        self.assertGreater(self.redis.ttl(f'contest:{self.contest.id}:leaderboard'), 0)
+
+    def test_rebuilds_a_lost_board_from_the_participants(self):
+        self.join(self.users[0], 5, elapsed=10)
+        self.join(self.users[1], 10, elapsed=30)
+        self.redis.flushall()
+
+        finalize_leaderboard(self.contest)
+        self.assertEqual(self.ranking(), [('player1', 10, 1), ('player0', 5, 2)])
+
+    def test_scores_are_rolled_up_once(self):
+        self.join(self.users[0], 5, elapsed=10)
+
+        finalize_leaderboard(self.contest)
+        finalize_leaderboard(self.contest)
+        self.contest.refresh_from_db()
+        self.assertTrue(self.contest.scores_rolled_up)
+        rollup = LeaderboardRollup.objects.get(user=self.users[0], period='all', period_start=ALL_TIME_START)
+        self.assertEqual((rollup.score, rollup.contests), (5, 1))
+        self.assertEqual(Leaderboard.objects.filter(contest=self.contest).count(), 1)
+
+
+class GradingTests(TestCase):
+    """Answer keys and scores of contest submissions."""
+
+    def test_points_are_split_over_the_total_questions(self):
+        contest = make_contest(status='ongoing')
+        for i in range(3):
+            question = Question.objects.create(contest=contest, question_text=f'question {i}')
+            Option.objects.create(question=question, option_text='right', is_correct=True)
+
+        answer_key = load_answer_key(contest)
+        self.assertEqual([question['points'] for question in answer_key.values()], [3, 3, 3])
+
+    def test_add_points_returns_the_new_score(self):
+        user = CustomUser.objects.create(username='player', email='player@example.com', role='student')
+        participant = Participant.objects.create(contest=make_contest(status='ongoing'), user=user, score=4)
 
-# Create your tests here.
+        self.assertEqual(add_points(participant.id, 3), 7)
+        self.assertIsNone(add_points(participant.id + 1, 3))
+        participant.refresh_from_db()
+        self.assertEqual(participant.score, 7)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContestViewSet, QuestionViewSet, SubmissionViewSet, global_leaderboard
+from .views import ContestViewSet, QuestionViewSet, SubmissionViewSet, GlobalLeaderboardView, my_global_rank
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -10,5 +10,6 @@ router.register(r'answer-submission', SubmissionViewSet, basename='answer-submis
 
 urlpatterns = [
     path('', include(router.urls)),  # Include the router URLs
-    path('global-leaderboard/', global_leaderboard, name='global-leaderboard')  # Global leaderboard endpoint
+    path('global-leaderboard/', GlobalLeaderboardView.as_view(), name='global-leaderboard'),  # Global leaderboard endpoint
+    path('global-leaderboard/me/', my_global_rank, name='global-leaderboard-me'),
 ]
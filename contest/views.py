@@ -1,42 +1,60 @@
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from rest_framework.viewsets import ModelViewSet
-from rest_framework import status
+from rest_framework import status, generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
-from django.utils.timezone import now
-from django.db.models import Sum
-from django.core.cache import cache
+from django.utils.timezone import now, localdate
+from base.custom_cache import CachedListMixin, invalidate_tags
+from base.custom_pagination_class import CustomLeaderboardCursorPagination
 from rest_framework.permissions import AllowAny
 
-from .models import Contest, Question, Option, Participant, Leaderboard, Submission
+from .models import Contest, Question, Participant, Leaderboard, LeaderboardRollup, Submission
+from .grading import get_answer_key, grade, add_points
+from .leaderboard import add_participant, record_score, live_leaderboard, get_leaderboard_entries, get_period_starts, get_global_rank
 from .serializers import (
     ContestSerializer,
     QuestionSerializer,
     ParticipantSerializer,
     SubmissionSerializer,
+    LeaderboardRollupSerializer,
+    BatchSubmissionSerializer,
 )
 
 # Create your views here.
 
-class ContestViewSet(ModelViewSet):
+class ContestViewSet(CachedListMixin, ModelViewSet):
     """
     A viewset for viewing and editing Contest instances.
     """
     queryset = Contest.objects.all().prefetch_related('leaderboards').order_by('-id')
     serializer_class = ContestSerializer
     permission_classes = [AllowAny]
+    cache_prefix = 'contests'
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Serialize listed and retrieved contests with their leaderboards
+        loaded in bulk.
+        """
+        if self.action in ('list', 'retrieve') and args:
+            contests = args[0] if kwargs.get('many') else [args[0]]
+            context = self.get_serializer_context()
+            context['leaderboards'] = get_leaderboard_entries(contests)
+            kwargs['context'] = context
+        return super().get_serializer(*args, **kwargs)
+
+    def get_cache_tags(self):
+        tags = ['contests']
+        if self.request.user.is_authenticated:
+            tags.append(f'contests:user:{self.request.user.id}')
+        return tags
 
     def get_queryset(self):
         """
-        Retrieves the list of contests, applying caching and filtering based on user role.
+        Retrieves the list of contests, filtered based on user role.
         """
         user = self.request.user
-        cache_key = f"contest_{user.id if user.is_authenticated else 'public'}"
-        cached_contest = cache.get(cache_key)
-
-        if cached_contest is not None:
-            return cached_contest
-
         queryset = Contest.objects.all().order_by('-id')
 
         # Filtering based on user role
@@ -50,7 +68,6 @@ class ContestViewSet(ModelViewSet):
             elif user.role == 'student':
                 queryset = queryset.all()
 
-        cache.set(cache_key, queryset, 60 * 15)  # Cache for 15 minutes
         return queryset
 
     def perform_create(self, serializer):
@@ -58,20 +75,27 @@ class ContestViewSet(ModelViewSet):
         Saves a new contest and invalidates the cache.
         """
         serializer.save()
-        self.invalidate_all_cache()
+        self.invalidate_cache()
+
+    def perform_update(self, serializer):
+        """
+        Saves changes to a contest and invalidates the cache.
+        """
+        serializer.save()
+        self.invalidate_cache()
 
     def perform_destroy(self, instance):
         """
         Deletes a contest and invalidates the cache.
         """
         instance.delete()
-        self.invalidate_all_cache()
+        self.invalidate_cache()
 
-    def invalidate_all_cache(self):
+    def invalidate_cache(self):
         """
-        Invalidate all cached data.
+        Invalidate the cached contest lists.
         """
-        cache.clear()
+        invalidate_tags('contests')
 
     @action(detail=True, methods=['post'], url_path='participate')
     def participate(self, request, pk=None):
@@ -89,9 +113,38 @@ class ContestViewSet(ModelViewSet):
         if not created:
             return Response({'error': "You're already participated in this contest"}, status=status.HTTP_400_BAD_REQUEST)
 
+        add_participant(contest.id, user.id)
+        invalidate_tags(f'contests:user:{user.id}')
+
         serializer = ParticipantSerializer(participant)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='leaderboard')
+    def leaderboard(self, request, pk=None):
+        """
+        Returns the leading participants of a contest and the rank of the
+        requesting user. Live contests are served from the Redis leaderboard,
+        finished ones from the Leaderboard table.
+        """
+        contest = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+
+        if contest.status == 'finished':
+            entries = Leaderboard.objects.filter(contest=contest).order_by('rank')
+            top = [
+                {'rank': entry['rank'], 'score': entry['score'], 'user': {'id': entry['user_id'], 'username': entry['user__username']}}
+                for entry in entries.values('rank', 'score', 'user_id', 'user__username')[:limit]
+            ]
+            my_entry = None
+            if request.user.is_authenticated:
+                my_entry = entries.filter(user=request.user).values('rank', 'score').first()
+            return Response({'top': top, 'me': my_entry}, status=status.HTTP_200_OK)
+
+        return Response(live_leaderboard(contest, request.user, limit), status=status.HTTP_200_OK)
+
     
 class QuestionViewSet(ModelViewSet):
     """
@@ -111,16 +164,16 @@ class SubmissionViewSet(ModelViewSet):
     def create(self, request, *args, **kwargs):
         """
         Handles the submission of answers to questions.
-        """
-        participant_id = request.data.get('participant_id', '')
-        question_id = request.data.get('question_id', '')
-        selected_option_id = request.data.get('selected_option_id', '')
 
+        Answers are graded against the cached answer key of the contest; the
+        unique (participant, question) constraint rejects second submissions.
+        """
         try:
-            participant = get_object_or_404(Participant, id=participant_id)
-            question = get_object_or_404(Question, id=question_id)
-            selected_option = get_object_or_404(Option, id=selected_option_id)
-        except Exception:
+            participant_id = int(request.data.get('participant_id', ''))
+            question_id = int(request.data.get('question_id', ''))
+            selected_option_id = int(request.data.get('selected_option_id', ''))
+            participant = Participant.objects.select_related('contest').get(id=participant_id)
+        except (TypeError, ValueError, Participant.DoesNotExist):
             return Response({'detail': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
 
         contest = participant.contest
@@ -130,32 +183,100 @@ class SubmissionViewSet(ModelViewSet):
         if current_time > allowed_time:
             return Response({'detail': 'Time limit exceeded. Cannot submit the answer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if Submission.objects.filter(participant=participant, question=question).exists():
-            return Response({'info': 'You have already submitted this question'}, status=status.HTTP_400_BAD_REQUEST)
-
-        is_correct = selected_option.is_correct
+        result = grade(get_answer_key(contest), question_id, selected_option_id)
+        if result is None:
+            return Response({'detail': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
+        is_correct, points = result
 
-        submission = Submission.objects.create(
-            participant=participant,
-            question=question,
-            selected_option=selected_option,
-            is_correct=is_correct
-        )
+        try:
+            # The submission and its points are stored together or not at all
+            with transaction.atomic():
+                submission = Submission.objects.create(
+                    participant=participant,
+                    question_id=question_id,
+                    selected_option_id=selected_option_id,
+                    is_correct=is_correct
+                )
+                score = add_points(participant.id, points) if points else None
+        except IntegrityError:
+            return Response({'info': 'You have already submitted this question'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if is_correct:
-            points = contest.max_points / contest.total_questions
-            participant.score += points
-            participant.save()
+        if points:
+            record_score(contest.id, participant.user_id, score, submission.created_at - participant.created_at)
 
         serializer = SubmissionSerializer(submission)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Submits several answers of a participant at once.
+
+        The time limit is checked once, every answer is graded against the
+        cached answer key, the new submissions are inserted with one
+        bulk_create and the score is updated with a single statement. Answers
+        to questions already submitted are reported and left unchanged.
+        """
+        serializer = BatchSubmissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            participant = Participant.objects.select_related('contest').get(id=serializer.validated_data['participant_id'])
+        except Participant.DoesNotExist:
+            return Response({'detail': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
+
+        contest = participant.contest
+        current_time = now()
+        if current_time > participant.created_at + contest.time_limit:
+            return Response({'detail': 'Time limit exceeded. Cannot submit the answer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        answer_key = get_answer_key(contest)
+        already_submitted = set(Submission.objects.filter(participant=participant).values_list('question_id', flat=True))
+
+        results, submissions, points = [], [], 0
+        for answer in serializer.validated_data['answers']:
+            question_id = answer['question_id']
+            result = grade(answer_key, question_id, answer['selected_option_id'])
+            if result is None:
+                results.append({'question_id': question_id, 'status': 'invalid', 'points': 0})
+                continue
+            if question_id in already_submitted:
+                results.append({'question_id': question_id, 'status': 'already_submitted', 'points': 0})
+                continue
+
+            is_correct, earned = result
+            already_submitted.add(question_id)
+            submissions.append(Submission(
+                participant=participant,
+                question_id=question_id,
+                selected_option_id=answer['selected_option_id'],
+                is_correct=is_correct,
+            ))
+            points += earned
+            results.append({'question_id': question_id, 'status': 'correct' if is_correct else 'incorrect', 'points': earned})
+
+        try:
+            with transaction.atomic():
+                Submission.objects.bulk_create(submissions)
+                score = add_points(participant.id, points) if points else participant.score
+        except IntegrityError:
+            # A concurrent request of the same participant submitted some of these questions
+            return Response({'info': 'Some of these questions were just submitted, please retry'}, status=status.HTTP_409_CONFLICT)
+
+        if points:
+            # Same basis as rebuild_board: the last submission that earned points
+            last_scored_at = max(submission.created_at for submission in submissions if submission.is_correct)
+            record_score(contest.id, participant.user_id, score, last_scored_at - participant.created_at)
+
+        return Response({'score': score, 'results': results}, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['post'], url_path='stop_or_complete')
     def stop_or_complete(self, request):
         """
         Marks a participant's contest as completed.
 
-        Updates the leaderboard and participant details.
+        The live leaderboard is already up to date; the Leaderboard table is
+        written once the contest finishes.
         """
         participant_id = request.data.get('participant_id', '')
 
@@ -167,37 +288,47 @@ class SubmissionViewSet(ModelViewSet):
 
         participant.completed_at = now()
         participant.time_taken = now() - participant.created_at
-        participant.save()
+        participant.save(update_fields=['completed_at', 'time_taken', 'updated_at'])
 
-        update_leaderboard(participant.contest)
+        invalidate_tags(f'contests:user:{participant.user_id}')
 
         return Response({'detail' : 'Contest completed successfully '}, status=status.HTTP_200_OK)
 
 
-def update_leaderboard(contest):
-    """
-    Updates the leaderboard for a given contest based on participant scores.
+def get_leaderboard_period(request):
+    """Returns the period requested with ?period= and the start of its current window."""
+    period = request.query_params.get('period', 'all')
+    if period not in dict(LeaderboardRollup.PERIOD_CHOICES):
+        raise ValidationError({'period': 'Period must be one of all, week or month'})
+    return period, get_period_starts(localdate())[period]
+
 
-    Ranks participants and saves their scores in the leaderboard.
+class GlobalLeaderboardView(generics.ListAPIView):
     """
-    participants = Participant.objects.filter(contest=contest).order_by('-score')
-    for rank, participant in enumerate(participants, start=1):
-        Leaderboard.objects.update_or_create(
-            contest=contest,
-            user=participant.user,
-            defaults={'score': participant.score, 'rank': rank}
-        )
+    Retrieves the global leaderboard, highest total score first, from the
+    per user rollups. ?period= selects the all time (default), weekly or
+    monthly leaderboard, and the next cursor, which encodes the (score,
+    user_id) of the last entry, loads the following page.
+    """
+    serializer_class = LeaderboardRollupSerializer
+    pagination_class = CustomLeaderboardCursorPagination
+
+    def get_queryset(self):
+        period, period_start = get_leaderboard_period(self.request)
+        return LeaderboardRollup.objects.filter(period=period, period_start=period_start).select_related('user')
 
 
 @api_view(['GET'])
-def global_leaderboard(request):
+def my_global_rank(request):
     """
-    Retrieves the global leaderboard showing top participants based on total score.
-
-    Returns the top 10 participants sorted by total score.
+    Returns the rank and total score of the authenticated user on the global
+    leaderboard of the requested period.
     """
-    leaderboard = Leaderboard.objects.values('user__username').annotate(
-        total_score = Sum('score')
-    ).order_by('-total_score')[:10]
-
-    return Response(leaderboard)
\ No newline at end of file
+    if not request.user.is_authenticated:
+        return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    period, period_start = get_leaderboard_period(request)
+    rank = get_global_rank(request.user.id, period, period_start)
+    if rank is None:
+        return Response({'period': period, 'rank': None, 'total_score': 0}, status=status.HTTP_200_OK)
+    return Response({'period': period, 'rank': rank[0], 'total_score': rank[1]}, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from course.models import Course, Review
+
+
+RATING_FIELDS = ['rating_sum', 'rating_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the stored rating aggregates of every course from its reviews.
+    """
+    help = 'Recompute rating_sum, rating_count and the per-star histogram for all courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of courses updated per query.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # One grouped query computes every aggregate for every reviewed course
+        aggregates = (
+            Review.objects.filter(rating__isnull=False)
+            .values('course_id')
+            .annotate(
+                rating_sum=Sum('rating'),
+                rating_count=Count('id'),
+                **{f'rating_{star}_count': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+            )
+        )
+        aggregates = {row.pop('course_id'): row for row in aggregates}
+
+        with transaction.atomic():
+            courses = []
+            for course in Course.objects.only('id', *RATING_FIELDS).iterator(chunk_size=batch_size):
+                values = aggregates.get(course.id, {})
+                for field in RATING_FIELDS:
+                    setattr(course, field, values.get(field, 0))
+                courses.append(course)
+
+            Course.objects.bulk_update(courses, RATING_FIELDS, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {len(courses)} courses'))
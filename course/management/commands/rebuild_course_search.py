@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from course.models import Course
+from course.search import update_search_documents
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the stored full text search document of every course.
+    """
+    help = 'Recompute the search_document of all courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of courses updated per statement.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        course_ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+
+        for start in range(0, len(course_ids), batch_size):
+            update_search_documents(Course.objects.filter(id__in=course_ids[start:start + batch_size]))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search documents for {len(course_ids)} courses'))
@@ -0,0 +1,74 @@
+# Generated by Django 5.1 on 2026-10-18 08:43
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Course = apps.get_model('course', 'Course')
+    Review = apps.get_model('course', 'Review')
+
+    aggregates = (
+        Review.objects.filter(rating__isnull=False)
+        .values('course_id')
+        .annotate(
+            rating_sum=Sum('rating'),
+            rating_count=Count('id'),
+            **{f'rating_{star}_count': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+        )
+    )
+    for row in aggregates:
+        Course.objects.filter(pk=row.pop('course_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0019_alter_module_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_average',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=models.Case(models.When(rating_count=0, then=models.Value(0.0)), default=django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('rating_sum', models.FloatField()), '/', models.F('rating_count'))), output_field=models.FloatField()),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1 on 2026-10-18 08:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_search_documents(apps, schema_editor):
+    Course = apps.get_model('course', 'Course')
+    Module = apps.get_model('course', 'Module')
+    Category = apps.get_model('course', 'Category')
+    Tutor = apps.get_model('user_profile', 'Tutor')
+
+    module_titles = Module.objects.filter(course=OuterRef('pk'))\
+            .values('course')\
+            .annotate(titles=StringAgg('title', delimiter=' '))\
+            .values('titles')
+    tutor_name = Tutor.objects.filter(pk=OuterRef('tutor_id')).values('display_name')
+    category_name = Category.objects.filter(pk=OuterRef('category_id')).values('name')
+
+    Course.objects.update(search_document=(
+        SearchVector('title', weight='A', config='english')
+        + SearchVector(Subquery(tutor_name), weight='B', config='english')
+        + SearchVector(Subquery(category_name), weight='B', config='english')
+        + SearchVector(Subquery(module_titles), weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0020_course_rating_aggregates'),
+        ('user_profile', '0005_alter_tutor_status'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='course',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='course_search_document_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='course_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
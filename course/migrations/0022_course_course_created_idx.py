@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0021_course_search_document'),
+        ('user_profile', '0005_alter_tutor_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1 on 2026-10-18 08:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_progress_counts(apps, schema_editor):
+    Course = apps.get_model('course', 'Course')
+    Module = apps.get_model('course', 'Module')
+    StudentCourseProgress = apps.get_model('course', 'StudentCourseProgress')
+    WatchedModule = StudentCourseProgress.watched_modules.through
+
+    modules = Module.objects.filter(course=OuterRef('pk'))\
+            .values('course')\
+            .annotate(total=Count('id'))\
+            .values('total')
+    Course.objects.update(total_modules=Coalesce(Subquery(modules), 0))
+
+    watched = WatchedModule.objects.filter(studentcourseprogress_id=OuterRef('pk'))\
+            .values('studentcourseprogress_id')\
+            .annotate(total=Count('id'))\
+            .values('total')
+    StudentCourseProgress.objects.update(watched_count=Coalesce(Subquery(watched), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0022_course_course_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_modules',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentcourseprogress',
+            name='watched_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_progress_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0023_progress_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='module',
+            name='video',
+            field=models.FileField(blank=True, null=True, upload_to='module_videos/'),
+        ),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from users.models import CustomUser
 from user_profile.models import Tutor
 from django.core.validators import MinValueValidator, MaxValueValidator
 from base.base_models import BaseModel
 from django.utils.text import slugify
-from django.db.models import Avg
+from django.db.models import F, Case, When, Value
+from django.db.models.functions import Cast
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Category(models.Model):
@@ -62,6 +65,12 @@ class Course(BaseModel):
         rental_price (Decimal): The rental price of the course.
         rental_duration (int): Duration for which the course can be rented.
         is_active (bool): Indicates if the course is active.
+        rating_sum (int): Sum of all review ratings, maintained incrementally.
+        rating_count (int): Number of rated reviews, maintained incrementally.
+        rating_1_count .. rating_5_count (int): Histogram of reviews per star.
+        rating_average (float): Stored average rating generated from the sum and count.
+        search_document (SearchVector): Weighted full text document of the course, kept up to date by signals.
+        total_modules (int): Number of modules of the course, kept up to date by signals.
     """
     STATUS_CHOICES = (
         ('Approved', 'approved'),
@@ -88,14 +97,79 @@ class Course(BaseModel):
     rental_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     rental_duration = models.PositiveIntegerField(default=0, null=True)
     is_active = models.BooleanField(default=True)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    rating_average = models.GeneratedField(
+        expression=Case(
+            When(rating_count=0, then=Value(0.0)),
+            default=Cast('rating_sum', models.FloatField()) / F('rating_count'),
+        ),
+        output_field=models.FloatField(),
+        db_persist=True,
+        db_index=True,
+    )
+    search_document = SearchVectorField(null=True, editable=False)
+    total_modules = models.PositiveIntegerField(default=0)
+
+    # Maintained with F() updates only, never written by a full save of an existing course
+    COUNTER_FIELDS = frozenset(
+        ['rating_sum', 'rating_count', 'total_modules'] + [f'rating_{star}_count' for star in range(1, 6)]
+    )
+    # Also left out of full saves: the search document is written by update_search_documents
+    # and usually deferred, so saving it would cost a query and could write back a stale vector
+    UNSAVED_FIELDS = COUNTER_FIELDS | {'search_document'}
 
     @property
     def average_rating(self):
-        """Calculates and returns the average rating of the course."""
-        return self.reviews.aggregate(average_rating=Avg('rating'))['average_rating'] or 0
+        """Returns the average rating of the course from the stored aggregates."""
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    @property
+    def rating_histogram(self):
+        """Returns the number of reviews for each star rating."""
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
+    @classmethod
+    def apply_rating_change(cls, course_id, removed=None, added=None):
+        """
+        Incrementally updates the stored rating aggregates of a course.
+
+        Args:
+            course_id (int): The course whose aggregates change.
+            removed (int): A rating that no longer counts towards the course.
+            added (int): A rating that now counts towards the course.
+        """
+        deltas = {}
+        for rating, sign in ((removed, -1), (added, 1)):
+            if rating is None:
+                continue
+            deltas['rating_sum'] = deltas.get('rating_sum', 0) + sign * rating
+            deltas['rating_count'] = deltas.get('rating_count', 0) + sign
+            star_field = f'rating_{rating}_count'
+            deltas[star_field] = deltas.get(star_field, 0) + sign
+
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if course_id and updates:
+            cls.objects.filter(pk=course_id).update(**updates)
 
     def save(self, *args, **kwargs):
-        """Automatically generates a unique slug for the course."""
+        """
+        Automatically generates a unique slug for the course.
+
+        Full saves of an existing course leave out the fields maintained with
+        atomic updates and the search document, so a stale instance cannot
+        overwrite them.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name not in self.UNSAVED_FIELDS
+            ]
         if not self.slug:
             base_slug = slugify(self.title)
             slug = base_slug
@@ -112,6 +186,11 @@ class Course(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_document'], name='course_search_document_gin'),
+            GinIndex(fields=['title'], name='course_title_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+        ]
 
 
 class Module(BaseModel):
@@ -161,6 +240,7 @@ class StudentCourseProgress(BaseModel):
         access_expiry_date (date): The expiry date of access.
         liked_modules (ManyToManyField): Modules liked by the student.
         watched_modules (ManyToManyField): Modules watched by the student.
+        watched_count (int): Number of watched modules, kept up to date by signals.
     """
     PROGRESS_CHOICES = (
         ('Completed', 'completed'),
@@ -182,11 +262,23 @@ class StudentCourseProgress(BaseModel):
     access_expiry_date = models.DateField(null=True, blank=True)
     liked_modules = models.ManyToManyField(Module, related_name='liked_video', blank=True)
     watched_modules = models.ManyToManyField(Module, related_name='watched_video', blank=True)
+    watched_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         """Returns a string representation of the student's progress in the course."""
         return f'{self.student.username} - {self.course.title}'
 
+    @property
+    def progress_percentage(self):
+        """Returns the share of the course's modules watched, from the stored counts."""
+        total_modules = self.course.total_modules
+        return min(100, round(self.watched_count * 100 / total_modules)) if total_modules else 0
+
+    @property
+    def is_completed(self):
+        """Returns True when every module of the course has been watched."""
+        return self.course.total_modules > 0 and self.watched_count >= self.course.total_modules
+
 
 class Review(BaseModel):
     """
@@ -207,6 +299,22 @@ class Review(BaseModel):
         """Returns a string representation of the review."""
         return f'{self.user.username} - {self.course.title}'
 
+    def save(self, *args, **kwargs):
+        """Saves the review and updates the course rating aggregates in the same transaction."""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Review.objects.select_for_update().filter(pk=self.pk).values('course_id', 'rating').first()
+            super().save(*args, **kwargs)
+
+            if previous and previous['course_id'] != self.course_id:
+                Course.apply_rating_change(previous['course_id'], removed=previous['rating'])
+                Course.apply_rating_change(self.course_id, added=self.rating)
+            elif previous:
+                Course.apply_rating_change(self.course_id, removed=previous['rating'], added=self.rating)
+            else:
+                Course.apply_rating_change(self.course_id, added=self.rating)
+
 
 class Note(BaseModel):
     """
@@ -0,0 +1,267 @@
+import logging
+import time
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from base.custom_cache import invalidate_tags
+from .models import Course, Module, StudentCourseProgress
+
+
+# Watch progress heartbeats are appended to this stream and folded in by a Celery task
+PROGRESS_STREAM = 'progress:events'
+PROGRESS_GROUP = 'progress-ingest'
+PROGRESS_CONSUMER = 'worker'
+
+# Upper bound of the stream, so a stopped consumer cannot exhaust Redis memory
+PROGRESS_STREAM_MAXLEN = 1_000_000
+
+# Share of a module that has to be played for it to count as watched
+WATCHED_THRESHOLD = 0.9
+
+INGEST_LOCK_KEY = 'progress:ingest:lock'
+
+# Seconds the time of a student's last heartbeat per module is remembered
+HEARTBEAT_TIMEOUT = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+
+
+def _heartbeats_key(student_id):
+    """Returns the hash of the time, in milliseconds, of a student's last heartbeat per module."""
+    return f'progress:heartbeats:{student_id}'
+
+
+def record_progress_events(student_id, events):
+    """
+    Append a batch of watch heartbeats to the progress stream.
+
+    A single pipelined round trip to Redis and no database query, however
+    often the players report. Every event of the batch carries the time it
+    was received, which bounds the seconds it can add to the watch time.
+
+    Args:
+        student_id (int): The student who watched.
+        events (list): Validated events with module, position and seconds.
+    """
+    received_at = int(time.time() * 1000)
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for event in events:
+        pipe.xadd(PROGRESS_STREAM, {
+            'student': student_id,
+            'module': event['module'],
+            'position': event['position'],
+            'seconds': event['seconds'],
+            'at': received_at,
+        }, maxlen=PROGRESS_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+
+def clamp_watched_seconds(events, modules):
+    """
+    Bound the seconds of each heartbeat by the time that actually elapsed
+    since the previous heartbeat of the student for the same module.
+
+    The events of one request share the time they were received and share
+    the time elapsed since the previous request. Without a previous
+    heartbeat, a request adds at most the duration of the module.
+
+    Args:
+        events (list): Dicts with student, module, seconds and at, oldest first.
+        modules (dict): The id, course_id and duration of the modules, by id.
+
+    Returns:
+        dict: The time of the last heartbeat of each (student, module) pair.
+    """
+    pairs = list({(event['student'], event['module']) for event in events if event['module'] in modules})
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline(transaction=False)
+    for student_id, module_id in pairs:
+        pipe.hget(_heartbeats_key(student_id), module_id)
+    last_heartbeats = {pair: int(at) for pair, at in zip(pairs, pipe.execute()) if at is not None}
+
+    allowance = {}
+    for event in events:
+        module = modules.get(event['module'])
+        if module is None:
+            continue
+        pair = (event['student'], event['module'])
+        at, previous = event['at'], last_heartbeats.get(pair)
+        if allowance.get(pair, (None,))[0] != at:
+            # A new request: the elapsed time is shared by its events
+            if previous is None:
+                budget = module['duration'] or event['seconds']
+            else:
+                budget = max(at - previous, 0) // 1000
+            allowance[pair] = (at, budget)
+            last_heartbeats[pair] = max(at, previous or 0)
+
+        budget = allowance[pair][1]
+        event['seconds'] = min(event['seconds'], budget)
+        allowance[pair] = (at, budget - event['seconds'])
+    return last_heartbeats
+
+
+def save_last_heartbeats(last_heartbeats):
+    """Remember the time of the last heartbeat of each (student, module) pair."""
+    by_student = defaultdict(dict)
+    for (student_id, module_id), at in last_heartbeats.items():
+        by_student[student_id][module_id] = at
+
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for student_id, heartbeats in by_student.items():
+        pipe.hset(_heartbeats_key(student_id), mapping=heartbeats)
+        pipe.expire(_heartbeats_key(student_id), HEARTBEAT_TIMEOUT)
+    pipe.execute()
+
+
+def fold_progress_events(events):
+    """
+    Apply a batch of heartbeats to StudentCourseProgress in bulk.
+
+    Adds the watched seconds to watch_time, marks the modules played past
+    WATCHED_THRESHOLD as watched, moves last_accessed_module to the most
+    recent module and completes the courses whose modules are all watched.
+
+    Only the progress of enrolled students is updated; heartbeats for a
+    course the student has no progress row for are logged and dropped.
+
+    Args:
+        events (list): Dicts with student, module, position, seconds and at, oldest first.
+
+    Returns:
+        set: The ids of the students whose progress changed.
+    """
+    modules = {
+        module['id']: module
+        for module in Module.objects.filter(id__in={event['module'] for event in events})
+                .values('id', 'course_id', 'duration')
+    }
+    last_heartbeats = clamp_watched_seconds(events, modules)
+
+    seconds = defaultdict(int)
+    last_module = {}
+    watched = defaultdict(set)
+    for event in events:
+        module = modules.get(event['module'])
+        if module is None:
+            continue
+        key = (event['student'], module['course_id'])
+        seconds[key] += event['seconds']
+        last_module[key] = module['id']
+        if event['position'] >= (module['duration'] or 0) * WATCHED_THRESHOLD:
+            watched[key].add(module['id'])
+
+    if not last_module:
+        return set()
+
+    student_ids = {student_id for student_id, _ in last_module}
+    course_ids = {course_id for _, course_id in last_module}
+
+    with transaction.atomic():
+        progresses = {}
+        existing = StudentCourseProgress.objects\
+                .filter(student_id__in=student_ids, course_id__in=course_ids)\
+                .order_by('id')
+        for course_progress in existing:
+            progresses.setdefault((course_progress.student_id, course_progress.course_id), course_progress)
+
+        not_enrolled = [key for key in last_module if key not in progresses]
+        if not_enrolled:
+            logger.warning('Dropping watch progress of students not enrolled, as (student, course): %s', not_enrolled)
+            for key in not_enrolled:
+                del last_module[key]
+            if not last_module:
+                return set()
+
+        WatchedModule = StudentCourseProgress.watched_modules.through
+        WatchedModule.objects.bulk_create([
+            WatchedModule(studentcourseprogress_id=progresses[key].id, module_id=module_id)
+            for key, module_ids in watched.items() if key in progresses for module_id in module_ids
+        ], ignore_conflicts=True)
+
+        progress_ids = [progresses[key].id for key in last_module]
+        watched_counts = dict(
+            WatchedModule.objects.filter(studentcourseprogress_id__in=progress_ids)
+            .values('studentcourseprogress_id')
+            .annotate(total=Count('id'))
+            .values_list('studentcourseprogress_id', 'total')
+        )
+        module_counts = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'total_modules'))
+
+        updated = []
+        for key, module_id in last_module.items():
+            course_progress = progresses[key]
+            course_progress.watch_time = F('watch_time') + seconds[key]
+            course_progress.last_accessed_module_id = module_id
+            # The bulk insert above bypasses the m2m_changed signal, so store the recount
+            course_progress.watched_count = watched_counts.get(course_progress.id, 0)
+            total_modules = module_counts.get(key[1], 0)
+            if total_modules and course_progress.watched_count >= total_modules:
+                course_progress.progress = 'Completed'
+            elif course_progress.progress != 'Completed':
+                course_progress.progress = 'Ongoing'
+            updated.append(course_progress)
+
+        StudentCourseProgress.objects.bulk_update(updated, ['watch_time', 'last_accessed_module', 'progress', 'watched_count'])
+
+    save_last_heartbeats(last_heartbeats)
+    return {student_id for student_id, _ in last_module}
+
+
+def ingest_progress_events(batch_size=1000):
+    """
+    Consume the progress stream and fold the heartbeats into the database.
+
+    Events are read through a consumer group and acknowledged only once
+    folded, so a crashed run leaves them pending and the next run retries
+    them first.
+
+    Returns:
+        int: The number of events consumed.
+    """
+    if not cache.add(INGEST_LOCK_KEY, 1, 60 * 5):
+        # Another worker is consuming the stream
+        return 0
+
+    redis = get_redis_connection('default')
+    try:
+        try:
+            redis.xgroup_create(PROGRESS_STREAM, PROGRESS_GROUP, id='0', mkstream=True)
+        except ResponseError:
+            # The group already exists
+            pass
+
+        consumed = 0
+        # Retry the events left pending by a failed run, then read new ones
+        for start_id in ('0', '>'):
+            while True:
+                response = redis.xreadgroup(PROGRESS_GROUP, PROGRESS_CONSUMER, {PROGRESS_STREAM: start_id}, count=batch_size)
+                entries = response[0][1] if response else []
+                if not entries:
+                    break
+
+                event_ids = [event_id for event_id, _ in entries]
+                events = [
+                    {
+                        'student': int(fields[b'student']),
+                        'module': int(fields[b'module']),
+                        'position': int(fields[b'position']),
+                        'seconds': int(fields[b'seconds']),
+                        # Events queued before receive times were recorded fall back to the stream id
+                        'at': int(fields.get(b'at') or event_id.split(b'-')[0]),
+                    }
+                    for event_id, fields in entries if fields
+                ]
+                student_ids = fold_progress_events(events)
+                invalidate_tags(*[f'courses:user:{student_id}' for student_id in student_ids])
+
+                redis.xack(PROGRESS_STREAM, PROGRESS_GROUP, *event_ids)
+                redis.xdel(PROGRESS_STREAM, *event_ids)
+                consumed += len(event_ids)
+        return consumed
+    finally:
+        cache.delete(INGEST_LOCK_KEY)
@@ -0,0 +1,98 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Q, Subquery, When
+
+from user_profile.models import Tutor
+from .models import Category, Module
+
+
+SEARCH_CONFIG = 'english'
+
+# Minimum title similarity for the typo tolerant fallback
+TRIGRAM_THRESHOLD = 0.3
+
+PRICE_RANGES = {
+    'free': Q(price=0),
+    'under_500': Q(price__gt=0, price__lt=500),
+    '500_to_2000': Q(price__gte=500, price__lte=2000),
+    'over_2000': Q(price__gt=2000),
+}
+
+
+def course_search_vector():
+    """
+    Builds the weighted search document of a course from its title, tutor
+    display name, category name, module titles and description.
+    """
+    module_titles = Module.objects.filter(course=OuterRef('pk'))\
+            .values('course')\
+            .annotate(titles=StringAgg('title', delimiter=' '))\
+            .values('titles')
+    tutor_name = Tutor.objects.filter(pk=OuterRef('tutor_id')).values('display_name')
+    category_name = Category.objects.filter(pk=OuterRef('category_id')).values('name')
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(tutor_name), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_name), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(module_titles), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_documents(queryset):
+    """
+    Rebuilds the stored search document of every course in the queryset
+    with a single UPDATE statement.
+    """
+    return queryset.update(search_document=course_search_vector())
+
+
+def search_courses(queryset, query):
+    """
+    Ranks the courses of the queryset matching the query.
+
+    Uses the full text search document first, and falls back to trigram
+    similarity on the title when nothing matches, to tolerate typos. Both
+    are one statement: the fallback is guarded by an uncorrelated EXISTS
+    that Postgres evaluates once.
+    """
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    full_text = Q(search_document=search_query)
+    has_full_text_matches = Exists(queryset.filter(full_text))
+
+    return queryset.annotate(
+                similarity=TrigramSimilarity('title', query),
+                rank=Case(
+                    When(full_text, then=SearchRank(F('search_document'), search_query)),
+                    default=F('similarity'),
+                    output_field=FloatField(),
+                ),
+            )\
+            .filter(full_text | Q(~has_full_text_matches, title__trigram_similar=query, similarity__gte=TRIGRAM_THRESHOLD))\
+            .order_by('-rank', '-created_at')
+
+
+def search_facets(queryset):
+    """
+    Counts the matching courses per category, skill level and price range.
+    """
+    queryset = queryset.order_by().prefetch_related(None)
+    categories = queryset.values('category__slug', 'category__name')\
+            .annotate(count=Count('id'))\
+            .order_by('-count')
+    skill_levels = queryset.values('skill_level')\
+            .annotate(count=Count('id'))\
+            .order_by('-count')
+    price_ranges = queryset.aggregate(
+        **{name: Count('id', filter=condition) for name, condition in PRICE_RANGES.items()}
+    )
+
+    return {
+        'category': [
+            {'slug': row['category__slug'], 'name': row['category__name'], 'count': row['count']}
+            for row in categories
+        ],
+        'skill_level': list(skill_levels),
+        'price_range': price_ranges,
+    }
@@ -61,6 +61,9 @@ class ModuleSerializer(ModelSerializer):
         """
         request = self.context.get('request', None)
         if request and request.user.is_authenticated:
+            preloaded = self.context.get('preloaded')
+            if preloaded is not None:
+                return preloaded['notes'].get(obj.id, [])
             notes = Note.objects.filter(module=obj, user=request.user)
             return [{"id": note.id, "content": note.content, 'timeline': note.timeline} for note in notes]
         return None
@@ -71,6 +74,10 @@ class ModuleSerializer(ModelSerializer):
         """
         request = self.context.get('request', None)
         if request and request.user.is_authenticated:
+            preloaded = self.context.get('preloaded')
+            if preloaded is not None:
+                progress = preloaded['progress'].get(obj.course_id)
+                return obj.id in preloaded['watched_modules'][progress.id] if progress else False
             progress = StudentCourseProgress.objects.filter(student=request.user, course=obj.course).first()
             return obj in progress.watched_modules.all() if progress else False
         return False
@@ -81,6 +88,10 @@ class ModuleSerializer(ModelSerializer):
         """
         request = self.context.get('request', None)
         if request and request.user.is_authenticated:
+            preloaded = self.context.get('preloaded')
+            if preloaded is not None:
+                progress = preloaded['progress'].get(obj.course_id)
+                return obj.id in preloaded['liked_modules'][progress.id] if progress else False
             progress = StudentCourseProgress.objects.filter(student=request.user, course=obj.course).first()
             return obj in progress.liked_modules.all() if progress else False
 
@@ -161,16 +172,22 @@ class CourseSerializer(ModelSerializer):
     average_rating = serializers.SerializerMethodField(read_only=True)
     category_data = CategorySerializer(source='category', read_only=True)
     requested_course_count = serializers.SerializerMethodField(read_only=True)
+    rating_histogram = serializers.ReadOnlyField()
 
     class Meta:
         model = Course
-        fields = '__all__'
+        exclude = ['search_document']
+        read_only_fields = [
+            'rating_sum', 'rating_count', 'rating_1_count', 'rating_2_count',
+            'rating_3_count', 'rating_4_count', 'rating_5_count', 'total_modules',
+        ]
 
     def get_modules(self, obj):
         """
         Retrieves the modules with the context passed to include the request.
+        Uses the prefetched modules when the view preloaded them.
         """
-        modules = Module.objects.filter(course=obj)
+        modules = obj.modules.all() if 'preloaded' in self.context else Module.objects.filter(course=obj)
         return ModuleSerializer(modules, many=True, context=self.context).data
 
     def validate_thumbnail(self, value):
@@ -195,6 +212,13 @@ class CourseSerializer(ModelSerializer):
         """
         request = self.context.get('request')
         if request and request.user and request.user.is_authenticated:
+            preloaded = self.context.get('preloaded')
+            if preloaded is not None:
+                progress = preloaded['progress'].get(obj.id)
+                if progress:
+                    # Nested course is rendered without the request, as before
+                    return StudentCourseProgressSerializer(progress, context={'preloaded': preloaded}).data
+                return None
             progress = StudentCourseProgress.objects.filter(student=request.user, course=obj).first()
             if progress:
                 return StudentCourseProgressSerializer(progress).data
@@ -210,6 +234,9 @@ class CourseSerializer(ModelSerializer):
         """
         Counts the number of requested courses.
         """
+        preloaded = self.context.get('preloaded')
+        if preloaded is not None:
+            return preloaded['requested_course_count']
         return Course.objects.filter(status='Requested').count()
 
     def update(self, instance, validated_data):
@@ -263,7 +290,32 @@ class StudentCourseProgressSerializer(ModelSerializer):
     """
     course = CourseSerializer(read_only=True)  
     student = UserSerializers(read_only=True)
+    progress_percentage = serializers.ReadOnlyField()
     
     class Meta:
         model = StudentCourseProgress
         fields = '__all__'
+
+
+
+class ProgressEventSerializer(serializers.Serializer):
+    """
+    Serializer for a watch heartbeat sent by the video player.
+    Validated without touching the database; unknown modules are dropped when folded.
+    """
+    module = serializers.IntegerField(min_value=1)
+    position = serializers.IntegerField(min_value=0)
+    seconds = serializers.IntegerField(min_value=0, max_value=600)
+
+
+class ModuleCreateSerializer(ModelSerializer):
+    """
+    Serializer validating a module of a bulk import. Video and notes are the
+    storage paths of files already uploaded through presigned URLs.
+    """
+    video = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    class Meta:
+        model = Module
+        fields = ['title', 'description', 'duration', 'video', 'notes']
@@ -0,0 +1,179 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.db.models import F
+from django.db.models.functions import Greatest
+from base.counters import increment
+from user_profile.models import Tutor
+from .models import Category, Course, Module, Review, StudentCourseProgress
+from .search import update_search_documents
+from .utils import recount_watched_modules
+
+
+# Course fields that make up its search document
+SEARCH_FIELDS = {'title', 'description', 'tutor', 'category'}
+# Module fields that make up the search document of its course
+MODULE_SEARCH_FIELDS = {'title', 'course'}
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """
+    Signal receiver that removes a deleted review's rating from the course aggregates.
+
+    Runs inside the delete transaction, so cascaded deletes (e.g. removing a user)
+    keep the stored aggregates consistent as well.
+
+    Args:
+        sender: The model class (Review).
+        instance: The review being deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    Course.apply_rating_change(instance.course_id, removed=instance.rating)
+
+
+@receiver(post_save, sender=Course)
+def update_course_search_document(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal receiver that rebuilds the search document of a saved course.
+
+    Args:
+        sender: The model class (Course).
+        instance: The course being saved.
+        update_fields: The fields being saved, if the save was restricted to some fields.
+        **kwargs: Additional keyword arguments.
+    """
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_documents(Course.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Module)
+def update_module_course_search_document(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Signal receiver that rebuilds the search document of a module's course,
+    which includes the module titles.
+
+    Args:
+        sender: The model class (Module).
+        instance: The module being saved.
+        created (bool): Indicates if a new record was created.
+        update_fields: The fields being saved, if the save was restricted to some fields.
+        **kwargs: Additional keyword arguments.
+    """
+    if created or update_fields is None or MODULE_SEARCH_FIELDS & set(update_fields):
+        update_search_documents(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_delete, sender=Module)
+def remove_module_course_search_document(sender, instance, **kwargs):
+    """
+    Signal receiver that rebuilds the search document of a deleted module's course.
+
+    Args:
+        sender: The model class (Module).
+        instance: The module being deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    update_search_documents(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_save, sender=Tutor)
+def update_tutor_courses_search_document(sender, instance, created, **kwargs):
+    """
+    Signal receiver that rebuilds the search documents of a tutor's courses,
+    which include the tutor's display name.
+
+    Args:
+        sender: The model class (Tutor).
+        instance: The tutor being saved.
+        created (bool): Indicates if a new record was created.
+        **kwargs: Additional keyword arguments.
+    """
+    if not created:
+        update_search_documents(Course.objects.filter(tutor=instance))
+
+
+@receiver(post_save, sender=Category)
+def update_category_courses_search_document(sender, instance, created, **kwargs):
+    """
+    Signal receiver that rebuilds the search documents of a category's courses,
+    which include the category name.
+
+    Args:
+        sender: The model class (Category).
+        instance: The category being saved.
+        created (bool): Indicates if a new record was created.
+        **kwargs: Additional keyword arguments.
+    """
+    if not created:
+        update_search_documents(Course.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Module)
+def add_course_module_count(sender, instance, created, **kwargs):
+    """
+    Signal receiver that counts a new module in its course's total_modules.
+
+    Args:
+        sender: The model class (Module).
+        instance: The module being saved.
+        created (bool): Indicates if a new record was created.
+        **kwargs: Additional keyword arguments.
+    """
+    if created:
+        increment(Course, instance.course_id, 'total_modules')
+
+
+@receiver(pre_delete, sender=Module)
+def remove_watched_module_counts(sender, instance, **kwargs):
+    """
+    Signal receiver that uncounts a module from the progress of the students
+    who watched it, before its watched rows are cascade deleted.
+
+    Args:
+        sender: The model class (Module).
+        instance: The module being deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    progress_ids = StudentCourseProgress.objects.filter(watched_modules=instance).values('id')
+    StudentCourseProgress.objects.filter(id__in=progress_ids).update(watched_count=Greatest(F('watched_count') - 1, 0))
+
+
+@receiver(post_delete, sender=Module)
+def remove_course_module_count(sender, instance, **kwargs):
+    """
+    Signal receiver that uncounts a deleted module from its course's total_modules.
+
+    Args:
+        sender: The model class (Module).
+        instance: The module being deleted.
+        **kwargs: Additional keyword arguments.
+    """
+    increment(Course, instance.course_id, 'total_modules', -1)
+
+
+@receiver(m2m_changed, sender=StudentCourseProgress.watched_modules.through)
+def update_watched_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal receiver that keeps StudentCourseProgress.watched_count in step
+    with the watched_modules relation, from either side of it.
+
+    Args:
+        sender: The intermediate model of watched_modules.
+        instance: The progress (or the module, when reverse) being changed.
+        action (str): The m2m_changed action.
+        reverse (bool): True when the relation is changed from the module side.
+        pk_set (set): The primary keys actually added or removed.
+        **kwargs: Additional keyword arguments.
+    """
+    if action == 'post_add' and pk_set:
+        if reverse:
+            StudentCourseProgress.objects.filter(pk__in=pk_set).update(watched_count=F('watched_count') + 1)
+        else:
+            increment(StudentCourseProgress, instance.pk, 'watched_count', len(pk_set))
+    elif action == 'post_remove' and pk_set:
+        # pk_set may include modules that were not watched, so recount
+        recount_watched_modules(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear' and not reverse:
+        StudentCourseProgress.objects.filter(pk=instance.pk).update(watched_count=0)
+    elif action == 'pre_clear' and reverse:
+        remove_watched_module_counts(Module, instance)
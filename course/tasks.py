@@ -0,0 +1,19 @@
+from celery import shared_task
+from base.counters import flush_counters
+from .progress import ingest_progress_events
+
+
+@shared_task
+def flush_counters_task():
+    """
+    Write the view counts buffered in Redis to the database in batches.
+    """
+    return flush_counters()
+
+
+@shared_task
+def ingest_progress_events_task():
+    """
+    Fold the queued watch heartbeats into the students' course progress.
+    """
+    return ingest_progress_events()
@@ -1,3 +1,156 @@
+from unittest import mock
+
+import fakeredis
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from base.counters import buffer_increment, flush_counter
+from base.custom_pagination_class import CustomCursorPagination
+from user_profile.models import Tutor
+from users.models import CustomUser
+from .models import Category, Course, Module
+from .progress import clamp_watched_seconds
+
+
+def make_course(title='Course'):
+    """Creates an approved course with a tutor and a category."""
+    user = CustomUser.objects.create(username=f'tutor-{title}', email=f'{title}@example.com', role='tutor')
+    tutor = Tutor.objects.get_or_create(user=user)[0]
+    category = Category.objects.create(name=f'category-{title}')
+    return Course.objects.create(tutor=tutor, category=category, title=title, status='Approved')
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pagination over (created_at, id), newest first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        course = make_course()
+        cls.modules = [Module.objects.create(course=course, title=f'module {i}') for i in range(7)]
+        # Ties on created_at must be broken by id, neither skipping nor repeating rows
+        created_at = timezone.now()
+        Module.objects.filter(pk__in=[module.pk for module in cls.modules[:5]]).update(created_at=created_at)
+
+    def paginate(self, url):
+        paginator = CustomCursorPagination()
+        paginator.page_size = 3
+        request = Request(APIRequestFactory().get(url))
+        page = paginator.paginate_queryset(Module.objects.all(), request)
+        return paginator, [module.pk for module in page]
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(Module.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        seen, url = [], '/modules/'
+        while url:
+            paginator, page = self.paginate(url)
+            seen += page
+            url = paginator.get_next_link()
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_the_previous_page(self):
+        first, first_page = self.paginate('/modules/')
+        second, _ = self.paginate(first.get_next_link())
+        _, previous_page = self.paginate(second.get_previous_link())
+        self.assertEqual(previous_page, first_page)
+
+    def test_keyset_filter_breaks_ties_on_the_next_field(self):
+        module = Module.objects.order_by('-created_at', '-id')[1]
+        condition = CustomCursorPagination().get_keyset_filter(
+            Module, ('-created_at', '-id'), [module.created_at, module.pk]
+        )
+        after = Module.objects.filter(condition).order_by('-created_at', '-id')
+        expected = Module.objects.order_by('-created_at', '-id')[2:]
+        self.assertEqual(list(after), list(expected))
+
+
+class FlushCounterTests(TestCase):
+    """Buffered counter increments written to the database in batches."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('base.counters.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        course = make_course()
+        self.modules = [Module.objects.create(course=course, title=f'module {i}') for i in range(3)]
+        self.key = 'counter:course.module:views_count'
+
+    def test_applies_buffered_increments(self):
+        buffer_increment(Module, self.modules[0].pk, 'views_count', 3)
+        buffer_increment(Module, self.modules[1].pk, 'views_count')
+
+        self.assertEqual(flush_counter(self.redis, self.key, batch_size=1), 2)
+        counts = dict(Module.objects.values_list('pk', 'views_count'))
+        self.assertEqual(counts[self.modules[0].pk], 3)
+        self.assertEqual(counts[self.modules[1].pk], 1)
+        self.assertEqual(counts[self.modules[2].pk], 0)
+        self.assertEqual(self.redis.keys('counter:*'), [])
+
+    def test_second_flush_does_not_apply_a_batch_again(self):
+        buffer_increment(Module, self.modules[0].pk, 'views_count', 2)
+        flush_counter(self.redis, self.key)
+
+        self.assertEqual(flush_counter(self.redis, self.key), 0)
+        self.modules[0].refresh_from_db()
+        self.assertEqual(self.modules[0].views_count, 2)
+
+    def test_failed_flush_keeps_the_batch(self):
+        buffer_increment(Module, self.modules[0].pk, 'views_count', 2)
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                flush_counter(self.redis, self.key)
+        buffer_increment(Module, self.modules[0].pk, 'views_count')
+
+        # The kept batch is applied first, the newer increment by the following flush
+        flush_counter(self.redis, self.key)
+        flush_counter(self.redis, self.key)
+        self.modules[0].refresh_from_db()
+        self.assertEqual(self.modules[0].views_count, 3)
+
+    def test_locked_counter_is_skipped(self):
+        buffer_increment(Module, self.modules[0].pk, 'views_count')
+        self.redis.set(f'{self.key}:lock', 'other worker')
+
+        self.assertEqual(flush_counter(self.redis, self.key), 0)
+        self.modules[0].refresh_from_db()
+        self.assertEqual(self.modules[0].views_count, 0)
+
+
+class ClampWatchedSecondsTests(TestCase):
+    """Watch heartbeats bounded by the time that actually elapsed."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('course.progress.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.modules = {1: {'id': 1, 'course_id': 1, 'duration': 60}}
+
+    def event(self, seconds, at, module=1, student=7):
+        return {'student': student, 'module': module, 'position': 0, 'seconds': seconds, 'at': at}
+
+    def test_first_request_is_bounded_by_the_module_duration(self):
+        events = [self.event(50, 1000), self.event(50, 1000)]
+        last_heartbeats = clamp_watched_seconds(events, self.modules)
+        self.assertEqual([event['seconds'] for event in events], [50, 10])
+        self.assertEqual(last_heartbeats, {(7, 1): 1000})
+
+    def test_later_request_is_bounded_by_the_elapsed_time(self):
+        self.redis.hset('progress:heartbeats:7', 1, 1000)
+        events = [self.event(30, 21000), self.event(30, 41000)]
+        clamp_watched_seconds(events, self.modules)
+        self.assertEqual([event['seconds'] for event in events], [20, 20])
+
+    def test_out_of_order_request_adds_nothing(self):
+        self.redis.hset('progress:heartbeats:7', 1, 50000)
+        events = [self.event(30, 20000)]
+        last_heartbeats = clamp_watched_seconds(events, self.modules)
+        self.assertEqual(events[0]['seconds'], 0)
+        self.assertEqual(last_heartbeats, {(7, 1): 50000})
 
-# Create your tests here.
+    def test_unknown_modules_are_ignored(self):
+        events = [self.event(30, 1000, module=2)]
+        self.assertEqual(clamp_watched_seconds(events, self.modules), {})
+        self.assertEqual(events[0]['seconds'], 30)
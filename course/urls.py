@@ -7,6 +7,7 @@ from .views import (
     EditModuleView,
     CoursePurchaseView,
     PaymentSuccess,
+    ProgressEventsView,
     ReviewViewSet,
     NotesViewSet,
     get_presigned_url
@@ -26,6 +27,7 @@ urlpatterns = [
     path('modules/<pk>/', EditModuleView.as_view(), name='module-detail'),
     path('modules/<pk>/toggle-like/', EditModuleView.as_view(), name='module-toggle-like'),
     path('modules/<pk>/mark-watched/', EditModuleView.as_view(), name='mark-watched'),
+    path('progress/events/', ProgressEventsView.as_view(), name='progress-events'),
     path('stripe/course-purchase/', CoursePurchaseView.as_view(), name='stripe-payment'),  
     path('payment_success/', PaymentSuccess.as_view(), name='payment-success'),
     path('get-presigned-url/', get_presigned_url, name='get-presigned-url'),
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
+
+from base.custom_cache import invalidate_tags
+from .models import Course, Module, Review, StudentCourseProgress, Note
+
+
+def build_course_context(courses, request):
+    """
+    Preload everything CourseSerializer needs for a page of courses.
+
+    Modules, reviews, the requesting student's progress (with liked and
+    watched module ids) and their notes are all fetched in a fixed number
+    of queries, regardless of how many courses or modules are on the page.
+
+    Args:
+        courses (list): The Course instances that are about to be serialized.
+        request (Request): The current request, used to resolve the student.
+
+    Returns:
+        dict: Lookup tables to be passed to the serializers as context['preloaded'].
+    """
+    courses = list(courses)
+    course_ids = [course.id for course in courses]
+
+    prefetch_related_objects(
+        courses,
+        'category',
+        'tutor__user',
+        'tutor__education',
+        'tutor__experiences',
+        'tutor__skills',
+        Prefetch('modules', queryset=Module.objects.order_by('id')),
+        Prefetch('reviews', queryset=Review.objects.select_related('user')),
+    )
+
+    tutor_ids = {course.tutor_id for course in courses}
+    tutor_course_counts = dict(
+        Course.objects.filter(tutor_id__in=tutor_ids)
+        .values('tutor_id')
+        .annotate(total=Count('id'))
+        .values_list('tutor_id', 'total')
+    )
+
+    progress = {}
+    watched_modules = defaultdict(set)
+    liked_modules = defaultdict(set)
+    notes = defaultdict(list)
+
+    user = getattr(request, 'user', None)
+    if user and user.is_authenticated:
+        courses_by_id = {course.id: course for course in courses}
+        progress_queryset = StudentCourseProgress.objects\
+                .filter(student=user, course_id__in=course_ids)\
+                .prefetch_related('watched_modules', 'liked_modules')\
+                .order_by('id')
+        for course_progress in progress_queryset:
+            if course_progress.course_id not in progress:
+                course_progress.course = courses_by_id[course_progress.course_id]
+                course_progress.student = user
+                progress[course_progress.course_id] = course_progress
+                watched_modules[course_progress.id] = {module.id for module in course_progress.watched_modules.all()}
+                liked_modules[course_progress.id] = {module.id for module in course_progress.liked_modules.all()}
+
+        for note in Note.objects.filter(user=user, module__course_id__in=course_ids).order_by('id'):
+            notes[note.module_id].append({"id": note.id, "content": note.content, 'timeline': note.timeline})
+
+    # Users rendered through UserSerializers: reviewers, tutors and the requester
+    user_ids = {course.tutor.user_id for course in courses}
+    user_ids.update(review.user_id for course in courses for review in course.reviews.all())
+    if user and user.is_authenticated:
+        user_ids.add(user.id)
+
+    enrolled_courses = defaultdict(list)
+    enrolled = Course.objects.filter(student_progress__student_id__in=user_ids)\
+            .annotate(enrolled_user_id=F('student_progress__student_id'))\
+            .defer('search_document')
+    for course in enrolled:
+        enrolled_courses[course.enrolled_user_id].append(course)
+
+    return {
+        'requested_course_count': Course.objects.filter(status='Requested').count(),
+        'tutor_course_counts': tutor_course_counts,
+        'progress': progress,
+        'watched_modules': watched_modules,
+        'liked_modules': liked_modules,
+        'notes': notes,
+        'enrolled_courses': enrolled_courses,
+    }
+
+
+def invalidate_course_lists(*categories):
+    """
+    Invalidate the cached unfiltered course lists and the lists of the given categories.
+    """
+    invalidate_tags('courses', *[f'category:{category.slug}' for category in categories if category])
+
+
+def invalidate_student_course_lists(user):
+    """
+    Invalidate the cached course lists of a single user, whose progress,
+    likes or notes are rendered in them.
+    """
+    invalidate_tags(f'courses:user:{user.id}')
+
+
+def recount_watched_modules(progress_ids):
+    """
+    Recompute the stored watched_count of the given progress records from
+    the watched_modules relation, in a single UPDATE.
+    """
+    WatchedModule = StudentCourseProgress.watched_modules.through
+    watched = WatchedModule.objects.filter(studentcourseprogress_id=OuterRef('pk'))\
+            .values('studentcourseprogress_id')\
+            .annotate(total=Count('id'))\
+            .values('total')
+    StudentCourseProgress.objects.filter(id__in=progress_ids)\
+            .update(watched_count=Coalesce(Subquery(watched), 0))
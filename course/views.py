@@ -5,7 +5,10 @@ from users.models import CustomUser
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
 from rest_framework import status, generics
-from .serializers import CourseSerializer, CategorySerializer, ModuleSerializer, ReviewSerializer, NotesSerializer
+from .serializers import CourseSerializer, CategorySerializer, ModuleSerializer, ReviewSerializer, NotesSerializer, ProgressEventSerializer, ModuleCreateSerializer
+from .utils import build_course_context, invalidate_course_lists, invalidate_student_course_lists
+from .search import search_courses, search_facets, update_search_documents, PRICE_RANGES
+from .progress import record_progress_events
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.shortcuts import get_object_or_404
@@ -14,14 +17,16 @@ from datetime import timedelta
 from django.db import transaction
 import json
 import stripe
-from base.custom_pagination_class import CustomPagination
+from base.custom_pagination_class import CustomPagination, CustomCursorPagination
+from base.custom_parsers import NDJSONParser
 from base.custom_permissions import IsAdmin, IsStudent, IsTutor
 from rest_framework.permissions import AllowAny
 from django.db.models import Q
-from django.core.cache import cache
+from base.custom_cache import CachedListMixin, invalidate_tags
+from base.counters import increment, buffer_increment
 from rest_framework.exceptions import NotFound
 import boto3
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, action
 
 # Set the Stripe API key
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -75,7 +80,7 @@ def get_presigned_url(request):
         return Response({'error': str(e)}, status=500)
 
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(CachedListMixin, ModelViewSet):
     """
     API view for handling Category operations.
     Provides list, create, update, and delete functionalities for categories.
@@ -84,18 +89,27 @@ class CategoryViewSet(ModelViewSet):
     queryset = Category.objects.all().order_by('id')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    cache_prefix = 'categories'
 
-    def get_queryset(self):
+    def get_cache_scope(self):
         """
-        Override get_queryset to filter categories based on user role and cache results.
+        Category lists only depend on the user's role, so cache them per role.
         """
         user = self.request.user
-        cache_key = f'categories_{user.id if user.is_authenticated else "public"}'
-        cached_category = cache.get(cache_key)
+        if user.is_anonymous:
+            return 'public'
+        if user.is_staff:
+            return 'staff'
+        return getattr(user, 'role', None) or 'user'
 
-        if cached_category is not None:
-            return cached_category
+    def get_cache_tags(self):
+        return ['categories']
 
+    def get_queryset(self):
+        """
+        Override get_queryset to filter categories based on user role.
+        """
+        user = self.request.user
         queryset = Category.objects.all().order_by('id')
 
         # Filter categories based on user authentication and role
@@ -110,44 +124,41 @@ class CategoryViewSet(ModelViewSet):
             elif user.role == 'tutor':
                 queryset = queryset.exclude(Q(status='Requested') | Q(is_active=False))
 
-        # Cache the filtered queryset
-        cache.set(cache_key, queryset, 60 * 15)
         return queryset
 
-    def create(self, request, *args, **kwargs):
+    def perform_create(self, serializer):
         """
-        Create a new category and invalidate cache.
+        Create a new category and invalidate the category cache.
         """
-        response = super().create(request, *args, **kwargs)
-        self.invalidate_all_cache()
-        return response
+        category = serializer.save()
+        self.invalidate_cache(category)
 
-    def update(self, request, *args, **kwargs):
+    def perform_update(self, serializer):
         """
-        Update an existing category and invalidate cache.
+        Update an existing category and invalidate the caches that depend on it.
         """
-        response = super().update(request, *args, **kwargs)
-        self.invalidate_all_cache()
-        return response
+        previous_slug = serializer.instance.slug
+        category = serializer.save()
+        self.invalidate_cache(category, previous_slug)
 
-    def destroy(self, request, *args, **kwargs):
+    def perform_destroy(self, instance):
         """
-        Delete a category and invalidate cache.
+        Delete a category and invalidate the caches that depend on it.
         """
-        response = super().destroy(request, *args, **kwargs)
-        self.invalidate_all_cache()
-        return response
+        instance.delete()
+        self.invalidate_cache(instance)
 
-    def invalidate_all_cache(self):
+    def invalidate_cache(self, category, previous_slug=None):
         """
-        Invalidate all cached data.
+        Invalidate cached category lists and the course lists affected by the category.
         """
-        cache.clear()
+        slugs = {category.slug, previous_slug} - {None}
+        invalidate_tags('categories', 'courses', *[f'category:{slug}' for slug in slugs])
 
 
 
 
-class CourseViewSet(ModelViewSet):
+class CourseViewSet(CachedListMixin, ModelViewSet):
     """
     API view for handling Course operations.
     Provides list, create, update, and delete functionalities for courses.
@@ -157,8 +168,9 @@ class CourseViewSet(ModelViewSet):
     serializer_class = CourseSerializer
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     lookup_field = 'slug'
-    pagination_class = CustomPagination
+    pagination_class = CustomCursorPagination
     permission_classes = [AllowAny]
+    cache_prefix = 'courses'
 
     def get_serializer_context(self):
         """
@@ -166,21 +178,48 @@ class CourseViewSet(ModelViewSet):
         """
         return {'request': self.request}
 
-    def get_queryset(self):
+    def get_cache_tags(self):
+        category = self.request.query_params.get('category', '')
+        tags = [f'category:{category}'] if category else ['courses']
+        if self.request.user.is_authenticated:
+            tags.append(f'courses:user:{self.request.user.id}')
+        return tags
+
+    def get_cursor_ordering(self):
         """
-        Override get_queryset to filter courses based on user role and cache results.
+        Returns the keyset the list is paginated on, by rating when requested.
         """
-        user = self.request.user
-        category = self.request.query_params.get('category', '')
-        cache_key = f'courses_{user.id if user.is_authenticated else "public"}_{category}'
-        cached_courses = cache.get(cache_key)
+        if self.request.query_params.get('ordering') == 'rating':
+            return ('-rating_average', '-created_at', '-id')
+        return CustomCursorPagination.ordering
 
-        if cached_courses is not None:
-            return cached_courses
+    def get_course_context(self, courses):
+        """
+        Build the serializer context with the modules, progress, notes and
+        rating aggregates for the given courses preloaded in bulk.
+        """
+        context = self.get_serializer_context()
+        context['preloaded'] = build_course_context(courses, self.request)
+        return context
 
+    def get_serializer(self, *args, **kwargs):
+        """
+        Serialize listed and retrieved courses with preloaded related data.
+        """
+        if self.action in ('list', 'retrieve', 'search') and args:
+            courses = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'] = self.get_course_context(courses)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_visible_queryset(self):
+        """
+        Returns the courses the requesting user is allowed to see.
+        """
+        user = self.request.user
         queryset = Course.objects.all()\
-                .select_related('tutor', 'category')\
-                .prefetch_related('reviews')
+                .select_related('tutor__user', 'category')\
+                .prefetch_related('modules', 'reviews__user')\
+                .defer('search_document')
 
         # Filter courses based on user authentication and role
         if user.is_anonymous:
@@ -193,6 +232,16 @@ class CourseViewSet(ModelViewSet):
             elif user.role == 'student':
                 queryset = queryset.filter(Q(status='Approved', is_active=True, tutor__user__is_active=True, category__is_active=True))
 
+        return queryset
+
+    def get_queryset(self):
+        """
+        Override get_queryset to filter courses based on user role.
+        """
+        category = self.request.query_params.get('category', '')
+        ordering = self.request.query_params.get('ordering', '')
+        queryset = self.get_visible_queryset()
+
         # Filter by category if provided
         if category:
             queryset = queryset.filter(category__slug=category)
@@ -207,38 +256,72 @@ class CourseViewSet(ModelViewSet):
         if search_query:
             queryset = queryset.filter(title__icontains=search_query)
 
-        # Cache the filtered queryset
-        cache.set(cache_key, queryset, 60 * 15)
+        # Sort by the stored average rating, served by its index
+        if ordering == 'rating':
+            queryset = queryset.order_by('-rating_average', '-created_at', '-id')
 
         return queryset
 
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Ranked full text search over courses, with facets for category,
+        skill level and price range.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = search_courses(self.get_visible_queryset(), query)
+        facets = search_facets(matches)
+
+        # Apply the selected facets
+        category = request.query_params.get('category')
+        skill_level = request.query_params.get('skill_level')
+        price_range = request.query_params.get('price_range')
+        if category:
+            matches = matches.filter(category__slug=category)
+        if skill_level:
+            matches = matches.filter(skill_level=skill_level)
+        if price_range in PRICE_RANGES:
+            matches = matches.filter(PRICE_RANGES[price_range])
+
+        # Results are ordered by rank, which has no stable keyset
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['facets'] = facets
+        return response
+
     def perform_create(self, serializer):
         """
         Override perform_create to save the course with the tutor profile.
         """
         if hasattr(self.request.user, 'tutor_profile'):
-            serializer.save(tutor=self.request.user.tutor_profile)
-        self.invalidate_all_cache()
+            course = serializer.save(tutor=self.request.user.tutor_profile)
+            self.invalidate_cache(course.category)
 
     def perform_update(self, serializer):
         """
         Override perform_update to save changes to the course and invalidate cache.
         """
-        serializer.save()
-        self.invalidate_all_cache()
+        previous_category = serializer.instance.category
+        course = serializer.save()
+        self.invalidate_cache(previous_category, course.category)
 
     def perform_destroy(self, instance):
         """
         Override perform_destroy to delete the course and invalidate cache.
         """
         instance.delete()
-        self.invalidate_all_cache()
+        self.invalidate_cache(instance.category)
 
-    def invalidate_all_cache(self):
+    def invalidate_cache(self, *categories):
         """
-        Invalidate all cached data.
+        Invalidate the unfiltered course lists and the lists of the given categories.
         """
-        cache.clear()
+        invalidate_course_lists(*categories)
 
     def get_object(self):
         """
@@ -248,12 +331,13 @@ class CourseViewSet(ModelViewSet):
         slug = self.kwargs.get('slug', None)
 
         if slug:
+            queryset = Course.objects.select_related('tutor__user', 'category')
             if hasattr(user, 'role') and (user.role == 'tutor' or user.role == 'admin'):
                 # Admin or tutor can retrieve any course
-                course = Course.objects.filter(slug=slug).first()
+                course = queryset.filter(slug=slug).first()
             else:
                 # Other users can only retrieve active courses with active categories
-                course = Course.objects.filter(slug=slug, is_active=True, category__is_active=True).first()
+                course = queryset.filter(slug=slug, is_active=True, category__is_active=True).first()
 
             if course:
                 return course
@@ -269,38 +353,67 @@ class CourseViewSet(ModelViewSet):
 class ModuleView(APIView):
     """
     API view to handle module creation for a specific course.
+
+    Accepts the modules as a JSON list (or a JSON encoded form field) with
+    the course id, or as an NDJSON stream of modules with the course id in
+    the query string, for very large curricula.
     """
+    parser_classes = (JSONParser, NDJSONParser, MultiPartParser, FormParser)
+
+    # Upper bound of modules imported in a single request
+    max_modules = 5000
+
+    def get_modules_data(self, request):
+        """
+        Returns the course id and the list of module payloads of the request.
+        """
+        if isinstance(request.data, list):
+            return request.query_params.get('course'), request.data
+
+        modules_data = request.data.get('modules')
+        if isinstance(modules_data, str):
+            modules_data = json.loads(modules_data)
+        return request.data.get('course') or request.query_params.get('course'), modules_data
 
     def post(self, request, *args, **kwargs):
         """
         Create modules for the specified course.
+
+        Every module is validated before anything is written; the modules are
+        then inserted with a single bulk insert, in the same transaction as
+        the course status update, so a failed import leaves no partial course.
         """
-        modules_data = json.loads(request.data.get('modules'))
-        course_id = request.data.get('course')
-
-        # Retrieve the course and update its status
-        course = Course.objects.get(id=course_id)
-        course.status = 'Requested'
-        course.save()
-
-        # Create modules based on the provided data
-        for i, data in enumerate(modules_data):
-            title = data['title']
-            description = data['description']
-            duration = data['duration']
-            video = data.get('video') 
-            notes = data.get('notes') 
-
-            Module.objects.create(
-                course=course,
-                description=description,
-                duration = duration,
-                title=title,
-                video=video,
-                notes=notes
+        try:
+            course_id, modules_data = self.get_modules_data(request)
+        except ValueError:
+            return Response({'error': 'Modules must be valid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not isinstance(modules_data, list) or not modules_data:
+            return Response({'error': 'A list of modules is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(modules_data) > self.max_modules:
+            return Response({'error': f'At most {self.max_modules} modules can be imported at once'}, status=status.HTTP_400_BAD_REQUEST)
+
+        course = get_object_or_404(Course.objects.select_related('category'), id=course_id)
+
+        serializer = ModuleCreateSerializer(data=modules_data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            Course.objects.filter(pk=course.pk).update(status='Requested')
+            modules = Module.objects.bulk_create(
+                [Module(course=course, **data) for data in serializer.validated_data],
+                batch_size=500,
             )
 
-        return Response(data={'message' : 'Modules create sucessfully'}, status=status.HTTP_201_CREATED)
+            # bulk_create sends no signals, so update what they would maintain
+            increment(Course, course.pk, 'total_modules', len(modules))
+            update_search_documents(Course.objects.filter(pk=course.pk))
+
+        invalidate_course_lists(course.category)
+        return Response(data={
+            'message' : 'Modules create sucessfully',
+            'ids': [module.id for module in modules],
+        }, status=status.HTTP_201_CREATED)
 
 
 # Define the view to edit, retrieve, and delete modules
@@ -328,40 +441,44 @@ class EditModuleView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         """
         Handle the manual update of the 'video' and 'notes' paths.
+
+        Saves the module once, writing only the fields of the request so the
+        like and view counters are left to their atomic updates.
         """
-        instance = self.get_object()
+        instance = serializer.instance
 
         # Handle video and notes path updates manually
         video_url = self.request.data.get('video', '')
         notes_url = self.request.data.get('notes', '')
 
-        # Manually update video and notes
-        if video_url:
-            instance.video = video_url
-        if notes_url:
-            instance.notes = notes_url
-
-
         # Now let the serializer handle the rest of the fields
         validated_data = serializer.validated_data
-        validated_data.pop('video', None)  
-        validated_data.pop('notes', None)  
+        validated_data.pop('video', None)
+        validated_data.pop('notes', None)
 
-        # Update remaining fields with serializer and save
+        # Update remaining fields with serializer
         for key, value in validated_data.items():
             setattr(instance, key, value)
+        update_fields = list(validated_data)
 
-        # Save the instance
-        instance.save()
-
-        # manually update the video and notes fields
+        # Manually update video and notes
         if video_url:
             instance.video = video_url
+            update_fields.append('video')
         if notes_url:
             instance.notes = notes_url
+            update_fields.append('notes')
 
-        instance.save()  # Save again to persist video and notes
+        instance.save(update_fields=update_fields + ['updated_at'])
+        invalidate_course_lists(instance.course.category)
 
+    def perform_destroy(self, instance):
+        """
+        Delete the module and invalidate the course lists that render it.
+        """
+        category = instance.course.category
+        instance.delete()
+        invalidate_course_lists(category)
 
 
     def toggle_like(self, request, pk=None):
@@ -373,47 +490,76 @@ class EditModuleView(generics.RetrieveUpdateDestroyAPIView):
 
         course_progress, _ = StudentCourseProgress.objects.get_or_create(student=student, course=module.course)
 
-        if course_progress.liked_modules.filter(id=module.id).exists():
+        is_liked = course_progress.liked_modules.filter(id=module.id).exists()
+        if is_liked:
             course_progress.liked_modules.remove(module)
-            module.likes_count = max(0, module.likes_count-1)
-
+            increment(Module, module.pk, 'likes_count', -1)
         else:
             course_progress.liked_modules.add(module)
-            module.likes_count += 1
-        
-        module.save()
-        course_progress.save()
+            increment(Module, module.pk, 'likes_count')
 
-        return Response({'likes_count' : module.likes_count, 'is_liked' : course_progress.liked_modules.filter(id=module.id).exists()}, status=status.HTTP_200_OK)
+        module.refresh_from_db(fields=['likes_count'])
+        # Only the timestamp changes; the counters are kept by their atomic updates
+        course_progress.save(update_fields=['updated_at'])
+        invalidate_student_course_lists(student)
+
+        return Response({'likes_count' : module.likes_count, 'is_liked' : not is_liked}, status=status.HTTP_200_OK)
     
     def mark_watched(self, request, pk=None):
         """
         Mark a module as watched for the authenticated user.
         """
-        module = get_object_or_404(Module, pk=pk)
+        module = get_object_or_404(Module.objects.select_related('course'), pk=pk)
         student = request.user
-        module.views_count += 1
-        module.save()
+
+        # Buffered in Redis and written in batches by flush_counters_task
+        buffer_increment(Module, module.pk, 'views_count')
 
         course_progress, _ = StudentCourseProgress.objects.get_or_create(student=student, course=module.course)
         course_progress.progress = "Ongoing"
 
         if not course_progress.watched_modules.filter(id=module.id).exists():
+            # The stored watched_count is bumped by the m2m_changed signal
             course_progress.watched_modules.add(module)
+            course_progress.watched_count += 1
             course_progress.watch_time += module.duration
             course_progress.last_accessed_module = module
-        
-        total_modules = module.course.modules.count()
-        watched_modules_count = course_progress.watched_modules.count()
 
-        if total_modules == watched_modules_count:
+        if course_progress.is_completed:
             course_progress.progress = 'Completed'
-        
-        course_progress.save()
+
+        course_progress.save(update_fields=['progress', 'watch_time', 'last_accessed_module', 'updated_at'])
+        invalidate_student_course_lists(student)
 
         return Response({'message': 'Marked watched module'}, status=status.HTTP_200_OK)
 
 
+class ProgressEventsView(APIView):
+    """
+    API view to ingest batched watch heartbeats from the video player.
+    """
+    permission_classes = [IsStudent]
+
+    # Upper bound of heartbeats accepted in a single request
+    max_events = 100
+
+    def post(self, request, *args, **kwargs):
+        """
+        Queue the heartbeats; they are folded into the student's progress in the background.
+        """
+        events = request.data.get('events') if isinstance(request.data, dict) else request.data
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'A list of events is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > self.max_events:
+            return Response({'error': f'At most {self.max_events} events can be sent at once'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = ProgressEventSerializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+        record_progress_events(request.user.id, serializer.validated_data)
+
+        return Response({'queued': len(serializer.validated_data)}, status=status.HTTP_202_ACCEPTED)
+
+
 # Define the view for handling course purchases
 class CoursePurchaseView(APIView):
     """
@@ -523,8 +669,9 @@ class PaymentSuccess(APIView):
                     access_expiry_date=access_expiry_date
                 )
 
-                course.total_enrollment += 1
-                course.save()
+                increment(Course, course.pk, 'total_enrollment')
+
+            invalidate_student_course_lists(user)
 
             return Response({'message': "Payment successful and access granted"}, status=status.HTTP_201_CREATED)
 
@@ -553,6 +700,28 @@ class ReviewViewSet(ModelViewSet):
         """
         return {'request': self.request}
 
+    def perform_create(self, serializer):
+        """
+        Save the review and invalidate the course lists that render it.
+        """
+        review = serializer.save()
+        invalidate_course_lists(review.course.category)
+
+    def perform_update(self, serializer):
+        """
+        Save the review and invalidate the course lists that render it.
+        """
+        review = serializer.save()
+        invalidate_course_lists(review.course.category)
+
+    def perform_destroy(self, instance):
+        """
+        Delete the review and invalidate the course lists that rendered it.
+        """
+        category = instance.course.category
+        instance.delete()
+        invalidate_course_lists(category)
+
     def update(self, request, *args, **kwargs):
         """
         Override update method to check ownership of the review.
@@ -573,7 +742,7 @@ class ReviewViewSet(ModelViewSet):
 
 
 # Define the view for managing notes
-class NotesViewSet(ModelViewSet):
+class NotesViewSet(CachedListMixin, ModelViewSet):
     """
     API view to manage notes for a specific course.
     """
@@ -581,27 +750,19 @@ class NotesViewSet(ModelViewSet):
     queryset = Note.objects.all()
     serializer_class = NotesSerializer
     permission_classes = [IsStudent]
+    cache_prefix = 'notes'
+
+    def get_cache_tags(self):
+        return [f'notes:user:{self.request.user.id}']
 
     def get_queryset(self):
         """
-        Override get_queryset to filter notes based on the user's role and cache results.
+        Override get_queryset to filter notes based on the user's role.
         """
         user = self.request.user
-        cache_key = f'notes_{user.id}'
-        cached_notes = cache.get(cache_key)
-
 
-        print('hhhh')
-        if cached_notes is not None:
-            return cached_notes
-        print('hhhh===========')
-        
         # Filter notes by the authenticated user
-        queryset = Note.objects.filter(user=user)
-
-        # Cache the filtered queryset for 15 minutes
-        cache.set(cache_key, list(queryset), 60 * 15)  
-        return queryset
+        return Note.objects.filter(user=user)
     
     def get_object(self):
         print('===========================')
@@ -612,14 +773,14 @@ class NotesViewSet(ModelViewSet):
         Override perform_create to save the note with the authenticated user and invalidate cache.
         """
         serializer.save(user=self.request.user)
-        self.invalidate_all_cache() 
+        self.invalidate_cache() 
 
     def perform_update(self, serializer):
         """
         Override perform_update to save the note and invalidate cache.
         """
         serializer.save()
-        self.invalidate_all_cache()
+        self.invalidate_cache()
 
     def perform_destroy(self, instance):
         """
@@ -627,13 +788,15 @@ class NotesViewSet(ModelViewSet):
         """
         print('heyy=====================')
         instance.delete()
-        self.invalidate_all_cache()
+        self.invalidate_cache()
 
-    def invalidate_all_cache(self):
+    def invalidate_cache(self):
         """
-        Invalidate all cached data.
+        Invalidate the cached notes of the authenticated user only, along with
+        their course lists, which render the notes per module.
         """
-        cache.clear()
+        invalidate_tags(f'notes:user:{self.request.user.id}')
+        invalidate_student_course_lists(self.request.user)
 
     def get_serializer_context(self):
         """
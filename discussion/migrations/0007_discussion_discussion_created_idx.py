@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discussion', '0006_alter_comment_created_at_alter_comment_updated_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['created_at', 'id'], name='discussion_created_idx'),
+        ),
+    ]
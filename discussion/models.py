@@ -17,6 +17,11 @@ class Discussion(BaseModel):
     upvoted_by = models.ManyToManyField(CustomUser, related_name='upvoted_discussions', blank=True)
     downvoted_by = models.ManyToManyField(CustomUser, related_name='downvoted_discussions', blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='discussion_created_idx'),
+        ]
+
     def __str__(self) -> str:
         """
         String representation of the discussion instance.
@@ -9,6 +9,7 @@ from rest_framework.permissions import AllowAny
 from .serializers import DiscussionSerializer, CommentSerializer
 from .models import Discussion, Comment
 from base.custom_permissions import IsStudent
+from base.custom_pagination_class import CustomCursorPagination
 
 
 
@@ -45,9 +46,10 @@ class DiscussionViewSet(ModelViewSet):
     ViewSet for managing discussions.
     Allows operations like upvoting, downvoting, updating, and deleting discussions.
     """
-    queryset = Discussion.objects.all().prefetch_related('user', 'commented_discussion').order_by('-id')
+    queryset = Discussion.objects.all().prefetch_related('user', 'commented_discussion').order_by('-created_at', '-id')
     serializer_class = DiscussionSerializer
     permission_classes = [AllowAny]
+    pagination_class = CustomCursorPagination
 
     @action(detail=True, methods=['post'])
     def upvote(self, request, pk=None):
@@ -51,6 +51,9 @@ class TutorSerializer(serializers.ModelSerializer):
 
     def get_total_courses(self, obj):
         """Returns the total number of courses instructed by the tutor."""
+        preloaded = self.context.get('preloaded')
+        if preloaded is not None:
+            return preloaded['tutor_course_counts'].get(obj.id, 0)
         return obj.instructed_courses.count()
 
     def create(self, validated_data):
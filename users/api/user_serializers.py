@@ -11,7 +11,7 @@ from course.models import Course
 class EnrolledCourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = '__all__'  # Serialize all fields of the Course model
+        exclude = ['search_document']  # Serialize all fields of the Course model except the search index
 
 
 # Serializer for the CustomUser model
@@ -53,6 +53,9 @@ class UserSerializers(ModelSerializer):
 
     def get_enrolled_courses(self, obj):
         """Get the courses in which the user is enrolled."""
+        preloaded = self.context.get('preloaded')
+        if preloaded is not None:
+            return EnrolledCourseSerializer(preloaded['enrolled_courses'].get(obj.id, []), many=True).data
         enroll_course = Course.objects.filter(student_progress__student=obj)  # Get enrolled courses
         return EnrolledCourseSerializer(enroll_course, many=True).data  # Serialize and return courses
 
@@ -67,6 +70,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user: CustomUser):
         """Create and return a token for the given user."""
         token = super().get_token(user)  # Generate a token
+        token['username'] = user.username  # Identifies the user on WebSocket connections
         user.last_login = now()  # Update last login time
         user.save()  # Save user data
 
@@ -18,7 +18,8 @@ from course.models import StudentCourseProgress, Course, Category
 from course.serializers import CategorySerializer
 from user_profile.serializers import TutorSerializer
 from user_profile.models import Tutor
-from django.db.models import Count, Avg, Sum
+from django.db.models import Count, Sum, FloatField
+from django.db.models.functions import Cast, NullIf
 
 
 class RegisterView(APIView):
@@ -224,7 +225,7 @@ class LandingPage(viewsets.ViewSet):
                 .annotate(
                     total_courses=Count('courses', distinct=True),  
                     total_enrollment=Sum('courses__total_enrollment'),  
-                    average_rating=Avg('courses__reviews__rating') 
+                    average_rating=Cast(Sum('courses__rating_sum'), FloatField()) / NullIf(Sum('courses__rating_count'), 0)
                 )
                 .order_by('-id')[:6]
             )